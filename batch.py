@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+import sys
+from pathlib import Path
+
+import yaml
+
+from src.batch import get_scenario_table, get_scenarios, run_batch
+from src.load import load_inputs
+from src.utils import yaml_loader
+
+
+DUMPDIR = Path(__file__).parent / 'dump'
+
+
+# run all scenarios of a scenario grid (YAML file given as first command line arg, by default config/batch.yml) and
+# write their fuel data and FSCPs in the format given as second arg (csv by default; or parquet or feather),
+# partitioned by scenario and by the columns given as further args
+def batch():
+    grid_path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent / 'config' / 'batch.yml'
+    fmt = sys.argv[2] if len(sys.argv) > 2 else 'csv'
+    partition_cols = sys.argv[3:]
+
+    with open(grid_path, 'r') as f:
+        grid = yaml.load(f.read(), Loader=yaml_loader)
+
+    # load base inputs and get scenarios
+    inputs = {}
+    load_inputs(inputs)
+    scenarios = get_scenarios(grid)
+
+    # set directory for dumping
+    output_dir = DUMPDIR / 'batch'
+    output_dir.mkdir(parents=True, exist_ok=True)
+    get_scenario_table(grid).to_csv(output_dir / 'scenarios.csv', index=False)
+
+    # run scenarios
+    print(f"Running {len(scenarios)} scenarios...")
+    timing = run_batch(inputs, scenarios, output_dir, fmt=fmt, partition_cols=partition_cols)
+    if timing:
+        print(f"Done! Mean time per scenario: {sum(timing.values()) / len(timing):.2f}s")
+    else:
+        print('Done! The scenario grid contains no scenarios.')
+
+
+# call batch function when running as script
+if __name__ == '__main__':
+    batch()
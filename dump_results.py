@@ -1,4 +1,5 @@
 #!/usr/bin/env python
+import sys
 from pathlib import Path
 
 from src.dump_results import dump_results
@@ -9,8 +10,12 @@ from src.proc import process_inputs
 DUMPDIR = Path(__file__).parent / 'dump'
 
 
-# load required data and dump into Excel spreadsheet
+# load required data and dump into Excel spreadsheet or, if a columnar format (parquet, feather, or csv) is given as
+# first command line arg, into a directory of tables partitioned by the columns given as further args
 def dump():
+    fmt = sys.argv[1] if len(sys.argv) > 1 else 'xlsx'
+    partition_cols = sys.argv[2:]
+
     # load inputs and outputs
     inputs = {}
     outputs = {}
@@ -19,11 +24,11 @@ def dump():
 
     # set file path for dumping
     DUMPDIR.mkdir(parents=True, exist_ok=True)
-    file_path = DUMPDIR / 'results.xlsx'
+    file_path = DUMPDIR / ('results.xlsx' if fmt == 'xlsx' else 'results')
 
     # call dump function
-    print('Exporting results to spreadsheet...')
-    dump_results(inputs, outputs, file_path)
+    print(f"Exporting results to {'spreadsheet' if fmt == 'xlsx' else fmt + ' files'}...")
+    dump_results(inputs, outputs, file_path, fmt=fmt, partition_cols=partition_cols)
 
 
 # call dump function when running as script
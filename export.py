@@ -1,17 +1,65 @@
 #!/usr/bin/env python
+import math
 import sys
+import tempfile
+from pathlib import Path
 
-from webapp import webapp
+from src.plots.PlotGroup import get_print_sizes, get_subfig_names
+from src.render import get_image_size, render_figs
+from webapp import plot_group, webapp
 
 
-# get list of figs to plot from command line args and call webapp.export()
+export_formats = ['png', 'svg', 'pdf']
+
+
+# Get list of figs to plot from command line args, produce them via webapp.export(), and render all export formats
+# in a pool of render workers. This relies on the behaviour of piw v0.8.1 (pinned in pyproject.toml): webapp.export()
+# with an empty list of export formats produces and decorates all figures for print without writing any files. Pass
+# --check to also run the export of piw and check that the sizes of the rendered images match those exported by piw.
 def export():
-    if len(sys.argv) > 1:
-        fig_names = sys.argv[1:]
+    args = sys.argv[1:]
+    check = '--check' in args
+    fig_names = [arg for arg in args if arg != '--check'] or None
+
+    # produce and decorate figures, collecting them in the plot group (piw only writes files when checking)
+    plot_group.reset_printed()
+    webapp.export(fig_names, export_formats=export_formats if check else [])
+    figs, dpi = plot_group.get_printed()
+
+    output = Path(__file__).parent / 'print'
+    sizes = get_print_sizes(plot_group.figs)
+    if not check:
+        timing = render_figs(figs, sizes, output, export_formats=export_formats, dpi=dpi)
     else:
-        fig_names = None
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            timing = render_figs(figs, sizes, Path(tmp_dir), export_formats=export_formats, dpi=dpi)
+            _check_sizes(list(timing), Path(tmp_dir), output)
+
+    # every requested figure must have been produced and rendered
+    requested = fig_names if fig_names is not None else list(plot_group.figs)
+    missing = [
+        subfig_name
+        for fig_name in requested
+        for subfig_name in (get_subfig_names({fig_name: plot_group.figs[fig_name]})
+                            if fig_name in plot_group.figs else [fig_name])
+        if subfig_name not in timing
+    ]
+    if missing:
+        raise Exception(f"Figures were requested but not rendered: {', '.join(missing)}")
+
+    for fig_name, duration in timing.items():
+        print(f"{fig_name}: {duration:.2f}s")
+
 
-    webapp.export(fig_names, export_formats=['png', 'svg', 'pdf'])
+# compare sizes of images rendered here with those exported by piw
+def _check_sizes(fig_names: list, rendered: Path, baseline: Path):
+    for fig_name in fig_names:
+        for export_format in export_formats:
+            size = get_image_size(rendered / f"{fig_name}.{export_format}")
+            size_baseline = get_image_size(baseline / f"{fig_name}.{export_format}")
+            if not all(math.isclose(a, b, rel_tol=1e-3) for a, b in zip(size, size_baseline)):
+                raise Exception(f"Size of {fig_name}.{export_format} differs from the export of piw: {size} instead "
+                                f"of {size_baseline}.")
 
 
 # call export function when running as script
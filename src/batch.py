@@ -0,0 +1,137 @@
+import itertools
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+import pandas as pd
+
+from src.dump_results import write_table
+from src.proc import process_inputs
+from src.proc_func.fscps import calc_fscps
+
+
+# base inputs and settings shared with forked worker processes
+_shared: Optional[tuple] = None
+
+
+# Get scenarios from a scenario grid, i.e. all combinations of the values of all axes of the grid. Every axis overrides
+# the entries at one or several paths of keys into the inputs (starting with options, params, or fuels), e.g.
+# [options, gwp] or [fuels, NG, cases, gas_prices, high, cost_ng_price], given as path or as list of paths, with values
+# given as list or as dict of labelled values. If base is given, the base inputs are included as a value with this
+# label, so the axis needs no copy of the defaults. Scenario names join the labels of all axes, e.g.
+# 'gwp-gwp20_ngprice-higher', and must be unique.
+def get_scenarios(grid: dict) -> dict[str, list]:
+    scenarios = {}
+    for combination in itertools.product(*_get_axes(grid)):
+        name = '_'.join(f"{axis_name}-{label}" for axis_name, (label, _) in zip(grid['axes'], combination))
+        if name in scenarios:
+            raise Exception(f"Duplicate scenario name {name}: labels of scenario axes must be unique and must not "
+                            f"combine to the same name.")
+        scenarios[name] = [override for _, overrides in combination for override in overrides]
+
+    return scenarios
+
+
+# table of scenarios with the label of every axis
+def get_scenario_table(grid: dict) -> pd.DataFrame:
+    scenarios = get_scenarios(grid)
+    return pd.DataFrame([
+        {'scenario': name} | {axis_name: label for axis_name, (label, _) in zip(grid['axes'], combination)}
+        for name, combination in zip(scenarios, itertools.product(*_get_axes(grid)))
+    ])
+
+
+# labels and overrides (list of paths and values) of the values of all axes
+def _get_axes(grid: dict) -> list[list[tuple]]:
+    axes = []
+    for axis_name, axis in grid['axes'].items():
+        if ('path' in axis) == ('paths' in axis):
+            raise Exception(f"Scenario axis {axis_name} must have either a path or a list of paths.")
+        paths = [axis['path']] if 'path' in axis else axis['paths']
+        for path in paths:
+            if not path or path[0] not in ['options', 'params', 'fuels']:
+                raise Exception(f"Path of scenario axis {axis_name} must start with options, params, or fuels: "
+                                f"{path}")
+
+        if not isinstance(axis['values'], dict) and len({str(v) for v in axis['values']}) < len(axis['values']):
+            raise Exception(f"Values of scenario axis {axis_name} must have unique labels: {axis['values']}")
+        values = axis['values'] if isinstance(axis['values'], dict) else {str(v): v for v in axis['values']}
+        if 'base' in axis and str(axis['base']) in map(str, values):
+            raise Exception(f"Label of base inputs of scenario axis {axis_name} is also used for a value: "
+                            f"{axis['base']}")
+
+        axes.append(
+            ([(str(axis['base']), [])] if 'base' in axis else []) +
+            [(str(label), [(path, value) for path in paths]) for label, value in values.items()]
+        )
+
+    return axes
+
+
+# apply overrides to inputs, copying only the dicts along the paths of the overrides, so that the base inputs are shared
+# rather than copied
+def apply_overrides(inputs: dict, overrides: list) -> dict:
+    ret = dict(inputs)
+    for path, value in overrides:
+        entry = ret
+        for k, key in enumerate(path[:-1]):
+            if not isinstance(entry.get(key), dict):
+                raise Exception(f"Cannot override entry {'.'.join(map(str, path))}: "
+                                f"{'.'.join(map(str, path[:k + 1]))} not found in inputs.")
+            entry[key] = dict(entry[key])
+            entry = entry[key]
+        entry[path[-1]] = value
+
+    return ret
+
+
+# Run all scenarios on top of the base inputs and write their fuel data (totals of all fuels and years) and FSCPs into
+# output_dir, with one partition per scenario (see write_table). Scenarios are run in forked worker processes sharing
+# the base inputs where possible, and in chunks of neighbouring scenarios, so that workers can reuse results of their
+# previous scenario if only the fuels changed. Returns the run time of each scenario.
+def run_batch(inputs: dict, scenarios: dict[str, list], output_dir: Path, fmt: str = 'csv',
+              partition_cols: Optional[list] = None, max_workers: Optional[int] = None) -> dict[str, float]:
+    global _shared
+
+    names = list(scenarios)
+    max_workers = min(len(names), max_workers or os.cpu_count() or 1)
+    _shared = (inputs, scenarios, output_dir, fmt, partition_cols or [])
+
+    try:
+        if max_workers < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+            timing = [_run_scenario(name) for name in names]
+        else:
+            chunksize = max(1, len(names) // (4 * max_workers))
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                timing = list(pool.map(_run_scenario, names, chunksize=chunksize))
+    finally:
+        _shared = None
+
+    return dict(zip(names, timing))
+
+
+def _run_scenario(name: str) -> float:
+    inputs, scenarios, output_dir, fmt, partition_cols = _shared
+    start = time.perf_counter()
+
+    outputs = {}
+    process_inputs(apply_overrides(inputs, scenarios[name]), outputs)
+
+    tables = {
+        'fuelData': outputs['fuelDataStore'].totals(),
+        'fscps': calc_fscps(outputs['fuelData']),
+    }
+    for table_name, table in tables.items():
+        # replace results previously written for the same scenario
+        shutil.rmtree(output_dir / table_name / f"scenario={quote(name, safe='')}", ignore_errors=True)
+
+        table = table.assign(scenario=name)
+        cols = ['scenario'] + [c for c in partition_cols if c in table.columns]
+        write_table(table, output_dir / table_name, fmt, cols)
+
+    return time.perf_counter() - start
@@ -0,0 +1,60 @@
+import hashlib
+import json
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+
+# Content-addressed cache of results. Keys are canonical hashes of JSON-serialisable objects (dict keys are sorted), so
+# equal contents map to the same entry irrespective of their identity or order. Entries are kept in memory with
+# least-recently-used eviction and are optionally also stored as pickle files on disk. Access to the entries in memory is
+# guarded by a lock, so a cache can be shared between threads (e.g. concurrent callbacks of the webapp).
+class ResultCache:
+    def __init__(self, maxsize: int = 32, path: Optional[Path] = None):
+        self._maxsize: int = maxsize
+        self._path: Optional[Path] = path
+        self._entries: OrderedDict = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def key(*objs) -> str:
+        return hashlib.sha256(json.dumps(objs, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        if self._path is not None:
+            file_path = self._path / f"{key}.pkl"
+            if file_path.exists():
+                with open(file_path, 'rb') as f:
+                    value = pickle.load(f)
+                with self._lock:
+                    self._store(key, value)
+                return value
+
+        return None
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._store(key, value)
+
+        if self._path is not None:
+            self._path.mkdir(parents=True, exist_ok=True)
+            with open(self._path / f"{key}.pkl", 'wb') as f:
+                pickle.dump(value, f)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # must be called with the lock held
+    def _store(self, key: str, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
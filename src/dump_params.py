@@ -1,6 +1,4 @@
-import copy
 from pathlib import Path
-from string import ascii_uppercase
 
 import xlsxwriter
 
@@ -10,7 +8,7 @@ def dump_params(inputs: dict, file_path: Path):
 
     # create XLSX file
     print('Exporting parameters to spreadsheet...')
-    workbook = xlsxwriter.Workbook(file_path)
+    workbook = xlsxwriter.Workbook(file_path, {'constant_memory': True})
 
     # build worksheets
     _build_worksheet_params(workbook, params)
@@ -24,15 +22,17 @@ def dump_params(inputs: dict, file_path: Path):
 def _build_worksheet_params(workbook, params: dict):
     ws = workbook.add_worksheet('Base parameters')
 
-    # add headers
-    _add_headers(workbook, ws, ['Parameter name', 'Unit', 'Type', 'Year', 'Value', 'Source'])
+    # build table of parameter rows and write it
+    rows, merges = _get_param_table(params)
+    _write_table(workbook, ws, ['Parameter name', 'Unit', 'Type', 'Year', 'Value', 'Source'], rows, merges)
 
-    # add parameter rows
-    _add_param_rows(ws, params, 0, 1)
 
+# Table of parameter rows (description, unit, type, year, value, source) over parameter keys, subkeys, and years, and
+# the ranges of cells to merge (first row, first col, last row, last col), whose value is the one of their first cell.
+def _get_param_table(params: dict):
+    rows = []
+    merges = []
 
-# iterate over parameter keys, subkeys, and years
-def _add_param_rows(ws, params, start_col: int, param_start: int):
     for param_key, param_data in params.items():
         source = param_data['source'] if 'source' in param_data else ''
         options = param_data['options'] if 'options' in param_data else []
@@ -40,87 +40,82 @@ def _add_param_rows(ws, params, start_col: int, param_start: int):
         if param_data['value'] == 'cases':
             continue
 
-        type_start = 0
+        param_start = len(rows)
 
         for entries in _get_params(param_data['value'], options, param_data['type']):
-            type_end = type_start + len(entries['values']) - 1
-
             options_list = ', '.join([e.upper() for e in entries['options']])
 
-            if len(entries['values']) > 1:
-                ws.merge_range(_index_range(
-                    [param_start + type_start, param_start + type_end], start_col + 2),
-                    options_list,
-                )
-            else:
-                ws.write(
-                    _index(param_start + type_start, start_col + 2),
-                    options_list,
-                )
-
-            for k, year in enumerate(entries['values']):
-                value = entries['values'][year]
-                ws.write(_index(param_start + type_start + k, start_col + 3), year)
-                ws.write(_index(param_start + type_start + k, start_col + 4), value)
-
-            type_start = type_end + 1
-
-        param_end = param_start + type_end
+            type_start = len(rows)
+            for year, value in entries['values'].items():
+                rows.append([None, None, options_list if len(rows) == type_start else None, year, value, None])
+            _add_merge(merges, type_start, len(rows) - 1, 2)
 
         # write parameter description, unit, and source
-        if param_start == param_end:
-            ws.write(_index(param_start, start_col + 0), param_data['desc'])
-            ws.write(_index(param_start, start_col + 1), param_data['unit'])
-            ws.write(_index(param_start, start_col + 5), source)
-        else:
-            ws.merge_range(_index_range([param_start, param_end], start_col + 0), param_data['desc'])
-            ws.merge_range(_index_range([param_start, param_end], start_col + 1), param_data['unit'])
-            ws.merge_range(_index_range([param_start, param_end], start_col + 5), source)
+        rows[param_start][0:2] = [param_data['desc'], param_data['unit']]
+        rows[param_start][5] = source
+        for col in [0, 1, 5]:
+            _add_merge(merges, param_start, len(rows) - 1, col)
 
-        param_start = param_end + 1
-
-    return param_end
-
-
-def _add_headers(workbook, ws, cols: list):
-    # add a bold format to use to highlight cells.
-    bold = workbook.add_format({'bold': 1})
-
-    # insert header row
-    for colIndex, colName in enumerate(cols):
-        ws.write(_index(0, colIndex), colName, bold)
+    return rows, merges
 
 
 def _build_worksheet_cases(workbook, params: dict, fuels: dict):
     ws = workbook.add_worksheet('Fuel-specific cases')
 
-    # add parameter headers
-    _add_headers(workbook, ws, ['Fuel type', 'Case', 'Parameter name', 'Unit', 'Type', 'Year', 'Value', 'Source'])
-
-    # loop over fuels and cases
-    fuel_start = param_start = 1
+    # loop over fuels and cases, prepending fuel type and case to the parameter rows
+    rows = []
+    merges = []
     for fuel_id, fuel_specs in fuels.items():
-        # add cases
-        for caseGroup in fuel_specs['cases']:
+        fuel_start = len(rows)
+
+        for caseGroup in fuel_specs.get('cases', {}):
             for caseName, caseDetails in fuel_specs['cases'][caseGroup].items():
                 # determine params of case
-                params_case = {key: copy.deepcopy(params[key]) for key in caseDetails if key in params}
+                params_case = {key: params[key] | {'value': caseDetails[key]} for key in caseDetails if key in params}
                 if not params_case:
                     continue
-                for pName in params_case:
-                    params_case[pName]['value'] = caseDetails[pName]
 
                 # add parameter rows
-                param_end = _add_param_rows(ws, params_case, 2, param_start)
+                case_rows, case_merges = _get_param_table(params_case)
+                case_start = len(rows)
+                rows.extend([None, None] + row for row in case_rows)
+                merges.extend((r0 + case_start, c0 + 2, r1 + case_start, c1 + 2) for r0, c0, r1, c1 in case_merges)
 
                 # add case group and name
-                ws.merge_range(_index_range([param_start, param_end], 1), f"{caseGroup} {caseName}")
-
-                param_start = param_end + 1
+                rows[case_start][1] = f"{caseGroup} {caseName}"
+                _add_merge(merges, case_start, len(rows) - 1, 1)
 
         # add fuel name
-        ws.merge_range(_index_range([fuel_start, param_end], 0), fuel_id)
-        fuel_start = param_end + 1
+        if len(rows) > fuel_start:
+            rows[fuel_start][0] = fuel_id
+            _add_merge(merges, fuel_start, len(rows) - 1, 0)
+
+    _write_table(workbook, ws, ['Fuel type', 'Case', 'Parameter name', 'Unit', 'Type', 'Year', 'Value', 'Source'],
+                 rows, merges)
+
+
+def _add_merge(merges: list, first_row: int, last_row: int, col: int):
+    if last_row > first_row:
+        merges.append((first_row, col, last_row, col))
+
+
+# write header and table row by row (as required by the constant-memory mode of xlsxwriter), merging ranges of cells
+# in the row they start in
+def _write_table(workbook, ws, cols: list, rows: list, merges: list):
+    # add a bold format to use to highlight cells.
+    bold = workbook.add_format({'bold': 1})
+
+    # insert header row
+    ws.write_row(0, 0, cols, bold)
+
+    merges_by_row = {}
+    for first_row, first_col, last_row, last_col in merges:
+        merges_by_row.setdefault(first_row, []).append((first_col, last_row, last_col))
+
+    for r, row in enumerate(rows):
+        ws.write_row(r + 1, 0, row)
+        for first_col, last_row, last_col in merges_by_row.get(r, []):
+            ws.merge_range(r + 1, first_col, last_row + 1, last_col, row[first_col])
 
 
 def _get_params(values, options: list, valtype: str) -> list:
@@ -142,11 +137,3 @@ def _get_params(values, options: list, valtype: str) -> list:
             'options': [],
             'values': {'const': values},
         }]
-
-
-def _index(row: int, col: int) -> str:
-    return f"{ascii_uppercase[col]}{row+1}"
-
-
-def _index_range(rows: list, col: int) -> str:
-    return f"{ascii_uppercase[col]}{rows[0]+1}:{ascii_uppercase[col]}{rows[1]+1}"
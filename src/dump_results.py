@@ -1,9 +1,27 @@
+import shutil
 from pathlib import Path
+from typing import Optional
+from urllib.parse import quote, unquote
 
 import pandas as pd
+import yaml
 
 
-def dump_results(input_data: dict, output_data: dict, file_path: Path):
+# columnar export formats and their file extensions
+columnar_formats = {'parquet': 'parquet', 'feather': 'feather', 'csv': 'csv'}
+
+
+def dump_results(input_data: dict, output_data: dict, file_path: Path, fmt: str = 'xlsx',
+                 partition_cols: Optional[list] = None, scenario: Optional[str] = None):
+    if fmt == 'xlsx':
+        _dump_results_excel(input_data, output_data, file_path)
+    elif fmt in columnar_formats:
+        _dump_results_columnar(input_data, output_data, file_path, fmt, partition_cols or [], scenario)
+    else:
+        raise Exception(f"Unknown export format: {fmt}")
+
+
+def _dump_results_excel(input_data: dict, output_data: dict, file_path: Path):
     # extract dataframes from inputs and outputs
     options, params, fuels = (input_data['options'], input_data['params'], input_data['fuels'])
     full_params, fuel_data = (output_data['fullParams'], output_data['fuelData'])
@@ -18,3 +36,99 @@ def dump_results(input_data: dict, output_data: dict, file_path: Path):
 
         full_params.to_excel(writer, sheet_name='Parameters (full)')
         fuel_data.to_excel(writer, sheet_name='Fuel data (output)')
+
+
+# Write fullParams and fuelData into one directory each below dir_path, partitioned hive-style into subdirectories
+# (e.g. fuelData/scenario=base/fuel=NG-high-cons/part-0.parquet) by the scenario (if provided) and by those of the
+# partition columns a table has. Partitions are written one at a time. Results previously written for the same scenario
+# are replaced, whereas those of other scenarios are kept, so results of several scenarios can be written into the same
+# directory one after the other. The raw input dicts are written to a YAML file next to the tables.
+def _dump_results_columnar(input_data: dict, output_data: dict, dir_path: Path, fmt: str, partition_cols: list,
+                           scenario: Optional[str]):
+    _check_format(fmt)
+
+    tables = {
+        'fullParams': output_data['fullParams'].reset_index(),
+        'fuelData': output_data['fuelData'],
+    }
+
+    for table_name, table in tables.items():
+        # replace results previously written for the same scenario
+        old_path = dir_path / table_name / (f"scenario={quote(scenario, safe='')}" if scenario is not None else '')
+        if old_path.exists():
+            shutil.rmtree(old_path)
+
+        if scenario is not None:
+            table = table.assign(scenario=scenario)
+        cols = (['scenario'] if scenario is not None else []) + [c for c in partition_cols if c in table.columns]
+        write_table(table, dir_path / table_name, fmt, cols)
+
+    inputs_path = dir_path / (f"inputs-{quote(scenario, safe='')}.yml" if scenario is not None else 'inputs.yml')
+    with open(inputs_path, 'w') as f:
+        yaml.dump({key: input_data[key] for key in ['options', 'params', 'fuels']}, f, sort_keys=False)
+
+
+# write table partitioned by the given columns, one file per partition
+def write_table(table: pd.DataFrame, dir_path: Path, fmt: str, partition_cols: list):
+    _check_format(fmt)
+
+    groups = table.groupby(partition_cols, sort=False, dropna=False, observed=True) if partition_cols else [((), table)]
+
+    for values, part in groups:
+        values = values if isinstance(values, tuple) else (values,)
+        part_dir = dir_path.joinpath(*(f"{col}={quote(str(v), safe='')}" for col, v in zip(partition_cols, values)))
+        part_dir.mkdir(parents=True, exist_ok=True)
+        part = part.drop(columns=partition_cols).reset_index(drop=True)
+
+        file_path = part_dir / f"part-0.{columnar_formats[fmt]}"
+        if fmt == 'parquet':
+            part.to_parquet(file_path, index=False)
+        elif fmt == 'feather':
+            part.to_feather(file_path)
+        else:
+            part.to_csv(file_path, index=False)
+
+
+# read a table written by write_table, restoring partition columns from the directory names
+def read_table(dir_path: Path, fmt: str) -> pd.DataFrame:
+    _check_format(fmt)
+
+    parts = []
+    for file_path in sorted(dir_path.rglob(f"*.{columnar_formats[fmt]}")):
+        if fmt == 'parquet':
+            part = pd.read_parquet(file_path)
+        elif fmt == 'feather':
+            part = pd.read_feather(file_path)
+        else:
+            part = pd.read_csv(file_path)
+
+        keys = dict(d.split('=', 1) for d in file_path.parent.relative_to(dir_path).parts)
+        parts.append(part.assign(**{col: _parse_partition_value(unquote(v)) for col, v in keys.items()}))
+
+    if not parts:
+        raise Exception(f"No {fmt} files found in {dir_path}")
+
+    return pd.concat(parts, ignore_index=True)
+
+
+# check that the format is a columnar format and that the optional packages it requires are installed (parquet and
+# feather require pyarrow, which is installed with the extra columnar)
+def _check_format(fmt: str):
+    if fmt not in columnar_formats:
+        raise Exception(f"Unknown export format: {fmt}")
+
+    if fmt in ['parquet', 'feather']:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError(f"Export format {fmt} requires the optional package pyarrow, which can be installed "
+                              f"via the extra columnar (e.g. poetry install -E columnar).") from e
+
+
+def _parse_partition_value(value: str):
+    for conv in (int, float):
+        try:
+            return conv(value)
+        except ValueError:
+            pass
+    return value
@@ -1,8 +1,34 @@
-from src.proc_func.params import convert_unit
-from src.utils import load_yaml_data_file, load_csv_data_file
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.proc_func.params import convert_units
+from src.utils import BASE_PATH, load_yaml_data_file, load_csv_data_file
+
+
+# snapshot of loaded inputs, which is used instead of parsing the data files as long as they do not change
+snapshot_path = BASE_PATH / 'cache' / 'inputs.pkl'
+snapshot_version = 2
+data_files = ['options.yml', 'params.yml', 'fuels.yml', 'units.yml', 'iea.csv']
 
 
 def load_inputs(inputs: dict):
+    snapshot = _read_snapshot()
+    if snapshot is None:
+        snapshot = _write_snapshot(_load_inputs_from_files())
+
+    inputs |= snapshot['inputs']
+
+
+def _load_inputs_from_files():
+    inputs = {}
+
     # load input data from yaml files
     for key in ('options', 'params', 'fuels', 'units'):
         inputs[key] = load_yaml_data_file(key)
@@ -15,8 +41,88 @@ def load_inputs(inputs: dict):
 
     # load IEA CSV data into dataframe
     inputs['iea_data'] = load_csv_data_file('iea')
-    inputs['iea_data'][['value', 'unit']] = inputs['iea_data'].apply(
-        lambda row: convert_unit(row['reported_unit'], inputs['units'], row['reported_value']),
-        axis=1,
-        result_type='expand',
+    inputs['iea_data']['value'], inputs['iea_data']['unit'] = convert_units(
+        inputs['iea_data']['reported_value'], inputs['iea_data']['reported_unit'], inputs['units'],
     )
+
+    return inputs
+
+
+# Read snapshot if it is valid, i.e. if it was written by the same versions of Python, numpy, and pandas, and if every
+# data file either has the same modification time and size or the same content hash as when the snapshot was written.
+# Any snapshot that cannot be read is treated as missing. If only modification times or sizes changed, the snapshot is
+# rewritten, so that files are not hashed again next time.
+def _read_snapshot() -> Optional[dict]:
+    try:
+        with open(snapshot_path, 'rb') as f:
+            snapshot = pickle.load(f)
+
+        if (snapshot['version'] != snapshot_version or snapshot['versions'] != _get_versions() or
+                set(snapshot['files']) != set(data_files)):
+            return None
+
+        refresh = False
+        for file_name, (stat, file_hash) in snapshot['files'].items():
+            path = BASE_PATH / 'data' / file_name
+            if not path.exists():
+                return None
+            if _get_stat(path) != stat:
+                if _get_hash(path) != file_hash:
+                    return None
+                refresh = True
+    except Exception:
+        return None
+
+    if refresh:
+        snapshot = _write_snapshot(snapshot['inputs'])
+
+    return snapshot
+
+
+# write snapshot atomically (so that concurrently starting workers never read a partial file); failing to write it
+# (e.g. on a read-only file system) only means inputs are parsed again next time
+def _write_snapshot(inputs: dict) -> dict:
+    snapshot = {
+        'version': snapshot_version,
+        'versions': _get_versions(),
+        'files': {
+            file_name: (_get_stat(BASE_PATH / 'data' / file_name), _get_hash(BASE_PATH / 'data' / file_name))
+            for file_name in data_files
+        },
+        'inputs': inputs,
+    }
+
+    tmp_path = None
+    try:
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile('wb', dir=snapshot_path.parent, delete=False) as f:
+            tmp_path = f.name
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+        tmp_path = None
+    except OSError:
+        pass
+    finally:
+        # remove the temporary file if it was not moved into place
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    return snapshot
+
+
+# versions of Python and of the packages the pickled inputs depend on
+def _get_versions() -> dict:
+    return {'python': sys.version, 'numpy': np.__version__, 'pandas': pd.__version__}
+
+
+def _get_stat(path) -> tuple:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _get_hash(path) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
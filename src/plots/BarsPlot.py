@@ -8,6 +8,13 @@ from src.plots.BasePlot import BasePlot
 class BarsPlot(BasePlot):
     figs, cfg = load_yaml_plot_config_file('BarsPlot')
 
+    def _get_dependencies(self, subfig_name: str) -> dict:
+        return super()._get_dependencies(subfig_name) | {
+            'fuels': self.cfg['fuels'],
+            'years': self.cfg['years'],
+            'params': False,
+        }
+
     def plot(self, inputs: dict, outputs: dict, subfig_names: list) -> dict:
         # plot data
         plot_data = self._obtain_data(outputs['fuelData'], outputs['fuelSpecs'])
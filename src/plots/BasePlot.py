@@ -1,7 +1,10 @@
+import hashlib
+import json
 from abc import ABC
 from string import ascii_uppercase
 from typing import Optional, Final
 
+import pandas as pd
 import plotly.graph_objects as go
 
 from piw import AbstractPlot
@@ -14,6 +17,48 @@ class BasePlot(AbstractPlot, ABC):
     _add_subfig_name: bool = True
     _add_subfig_name_dict: Optional[dict] = None
 
+    # Data a subfigure depends on: the fuels and years of fuelData and fuelSpecs (None for all), whether the
+    # parameters of these fuels are used, and further entries of inputs and outputs. Plots override this to declare
+    # the data selected in their config, so that their figures only need to be rebuilt if this data changes.
+    def _get_dependencies(self, subfig_name: str) -> dict:
+        return {
+            'fuels': None,
+            'years': None,
+            'params': True,
+            'inputs': ['options', 'params_options'],
+            'outputs': [],
+        }
+
+    # hash of all data a subfigure depends on
+    def get_fingerprint(self, inputs: dict, outputs: dict, subfig_name: str) -> str:
+        deps = self._get_dependencies(subfig_name)
+        fuel_data, fuel_specs = outputs['fuelData'], outputs['fuelSpecs']
+        fuels = list(fuel_specs) if deps['fuels'] is None else deps['fuels']
+
+        selected = fuel_data['fuel'].isin(fuels)
+        if deps['years'] is not None:
+            selected &= fuel_data['year'].isin(deps['years'])
+
+        h = hashlib.sha256()
+        _update_hash(h, fuel_data[selected])
+        for fuel in fuels:
+            if fuel not in fuel_specs:
+                continue
+            _update_hash(h, {k: v for k, v in fuel_specs[fuel].items() if k != 'params'})
+            if deps['params']:
+                _update_hash(h, fuel_specs[fuel]['params'])
+        for key in deps['inputs']:
+            _update_hash(h, inputs[key])
+        for key in deps['outputs']:
+            _update_hash(h, outputs[key])
+
+        return h.hexdigest()
+
+    # Compute data memoised for the requested subfigures ahead of plot(). Plot groups call this in the parent process
+    # before building figures in forked workers, which inherit the memoised data. Nothing to do by default.
+    def prepare(self, inputs: dict, outputs: dict, subfig_names: list):
+        pass
+
     def _decorate(self, inputs: dict, outputs: dict, subfigs: dict):
         for subfig_name, subfig_plot in subfigs.items():
             if subfig_plot is None:
@@ -112,6 +157,14 @@ class BasePlot(AbstractPlot, ABC):
         return self._dpi * inch_per_pt * self._styles[size]
 
 
+def _update_hash(h, obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(pd.util.hash_pandas_object(obj).to_numpy().tobytes())
+        h.update(json.dumps(list(obj.columns) if isinstance(obj, pd.DataFrame) else obj.name, default=str).encode())
+    else:
+        h.update(json.dumps(obj, sort_keys=True, default=str).encode())
+
+
 def _count_numb_subplots(fig: go.Figure):
     grid_ref = fig._grid_ref
     return sum(1 for row in range(len(grid_ref))
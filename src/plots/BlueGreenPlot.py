@@ -13,6 +13,14 @@ from src.plots.BasePlot import BasePlot
 class BlueGreenPlot(BasePlot):
     figs, cfg = load_yaml_plot_config_file('BlueGreenPlot')
 
+    def _get_dependencies(self, subfig_name: str) -> dict:
+        return super()._get_dependencies(subfig_name) | {
+            'fuels': list(dict.fromkeys(
+                [self.cfg['fuelGreen'], self.cfg['fuelBlueLeft'], self.cfg['fuelBlueRight']] +
+                self.cfg['fuelsScatterGreen'] + self.cfg['fuelsScatterBlue']
+            )),
+        }
+
     def plot(self, inputs: dict, outputs: dict, subfig_names: list) -> dict:
         ret = {
             'figED1': self._produce_figure_full(outputs['fuelSpecs'], outputs['fuelData'], inputs['params_options'])
@@ -329,8 +337,7 @@ class BlueGreenPlot(BasePlot):
                                        ymin: float, params_options: dict):
         traces = []
 
-        # define data for plot grid
-        leakage = np.linspace(xmin, xmax, self.cfg['plotting']['n_samples'])
+        # define cost axis of plot grid
         delta_cost = np.linspace(self.cfg['plotting']['yaxis1_min'], self.cfg['plotting']['yaxis1_max'],
                                  self.cfg['plotting']['n_samples'])
 
@@ -353,11 +360,14 @@ class BlueGreenPlot(BasePlot):
         pars_blue = get_ghgi_params_blue(param_handler_blue, fuel_specs[blue_fuel]['options'])
         pars_green = get_ghgi_params_green(param_handler_green, fuel_specs[green_fuel]['options'])
 
-        # calculate FSCPs for grid
-        leakage_v, delta_cost_v = np.meshgrid(leakage, delta_cost)
-        pars_blue['mlr'] = (leakage_v, 0, 0)
-        ghgi_blue, ghgi_green = _get_ghgis(pars_blue, pars_green)
-        fscp = delta_cost_v / (ghgi_blue - ghgi_green)
+        # calculate GHGIs along leakage axis (refined where they cross) and FSCPs for grid
+        def get_ghgis(leakage):
+            return _get_ghgis(pars_blue | {'mlr': (leakage, 0, 0)}, pars_green)
+
+        leakage = _get_refined_axis(np.linspace(xmin, xmax, self.cfg['plotting']['n_samples']), get_ghgis,
+                                    self.cfg['plotting']['n_refine'])
+        ghgi_blue, ghgi_green = get_ghgis(leakage)
+        fscp = _get_fscp_grid(delta_cost, ghgi_blue, ghgi_green, zmax)
 
         # add contour traces
         traces.append(go.Heatmap(x=leakage * 100, y=delta_cost, z=fscp,
@@ -386,7 +396,7 @@ class BlueGreenPlot(BasePlot):
                                  )))
 
         # determine other xaxes ranges
-        range3 = [ghgi_blue[0][0], ghgi_blue[0][-1]]
+        range3 = [ghgi_blue[0], ghgi_blue[-1]]
 
         pars_blue = get_ghgi_params_blue(param_handler_blue, fuel_specs[blue_fuel]['options'])
         pars_blue_other = get_ghgi_params_blue(param_handler_blue, blue_options_other)
@@ -462,8 +472,7 @@ class BlueGreenPlot(BasePlot):
                                           params_options: dict):
         traces = []
 
-        # define data for plot grid
-        share = np.linspace(xmin, xmax, self.cfg['plotting']['n_samples'])
+        # define cost axis of plot grid
         delta_cost = np.linspace(self.cfg['plotting']['yaxis1_min'], self.cfg['plotting']['yaxis1_max'],
                                  self.cfg['plotting']['n_samples'])
 
@@ -486,17 +495,14 @@ class BlueGreenPlot(BasePlot):
         pars_blue = get_ghgi_params_blue(param_handler_blue, fuel_specs[blue_fuel]['options'])
         pars_green = get_ghgi_params_green(param_handler_green, fuel_specs[green_fuel]['options'])
 
-        # calculate FSCPs for grid
-        share_v, delta_cost_v = np.meshgrid(share, delta_cost)
-        pars_green['sh'] = (share_v, 0, 0)
-        ghgi_blue, ghgi_green = _get_ghgis(pars_blue, pars_green)
-        fscp = delta_cost_v / (ghgi_blue - ghgi_green)
+        # calculate GHGIs along share axis (refined where they cross) and FSCPs for grid
+        def get_ghgis(share):
+            return _get_ghgis(pars_blue, pars_green | {'sh': (share, 0, 0)})
 
-        # recolour the bit of the graph where emissions of green are higher than blue
-        for x in range(len(share)):
-            for y in range(len(delta_cost)):
-                if ghgi_green[x, y] > ghgi_blue:
-                    fscp[x, y] = zmax + 10.0
+        share = _get_refined_axis(np.linspace(xmin, xmax, self.cfg['plotting']['n_samples']), get_ghgis,
+                                  self.cfg['plotting']['n_refine'])
+        ghgi_blue, ghgi_green = get_ghgis(share)
+        fscp = _get_fscp_grid(delta_cost, ghgi_blue, ghgi_green, zmax)
 
         # add contour traces
         traces.append(go.Heatmap(x=share * 100, y=delta_cost, z=fscp,
@@ -525,7 +531,7 @@ class BlueGreenPlot(BasePlot):
                                  )))
 
         # determine other xaxes ranges
-        range3 = [ghgi_green[0][0], ghgi_green[0][-1]]
+        range3 = [ghgi_green[0], ghgi_green[-1]]
 
         pars_green = get_ghgi_params_green(param_handler_green, fuel_specs[green_fuel]['options'])
         pars_green_other = get_ghgi_params_green(param_handler_green, green_options_other)
@@ -680,6 +686,30 @@ def _convert_fuel_data(fuel_data: pd.DataFrame, fuel_x: str, fuel_y: str):
     return fscp_data
 
 
+# FSCPs on a grid of cost differences (rows) and GHGIs of blue and green hydrogen (columns); the part of the grid where
+# emissions of green are higher than blue is recoloured
+def _get_fscp_grid(delta_cost: np.ndarray, ghgi_blue, ghgi_green, zmax: float) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fscp = delta_cost[:, np.newaxis] / (ghgi_blue - ghgi_green)
+
+    return np.where(ghgi_green > ghgi_blue, zmax + 10.0, fscp)
+
+
+# add samples to an axis around the points where the GHGIs of blue and green hydrogen cross, as the FSCP diverges and
+# contour lines accumulate there
+def _get_refined_axis(x: np.ndarray, get_ghgis, n_refine: int) -> np.ndarray:
+    ghgi_blue, ghgi_green = get_ghgis(x)
+    diff = np.broadcast_to(ghgi_blue - ghgi_green, x.shape)
+    crossings = np.flatnonzero(np.sign(diff[:-1]) != np.sign(diff[1:]))
+    if not n_refine or not len(crossings):
+        return x
+
+    return np.union1d(x, np.concatenate([
+        np.linspace(x[max(i - 1, 0)], x[min(i + 2, len(x) - 1)], n_refine)
+        for i in crossings
+    ]))
+
+
 def _get_ghgis(pars_blue, pars_green, base_only: bool = False) -> tuple[float, float]:
     ghgi_blue = get_ghgi_blue(**pars_blue)
     ghgi_green = get_ghgi_green(**pars_green)
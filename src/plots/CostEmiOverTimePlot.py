@@ -12,6 +12,22 @@ from src.plots.BasePlot import BasePlot
 class CostEmiOverTimePlot(BasePlot):
     figs, cfg = load_yaml_plot_config_file('CostEmiOverTimePlot')
 
+    def _get_dependencies(self, subfig_name: str) -> dict:
+        subcfg = self._subfig_cfgs['fig1A'] | self._subfig_cfgs['figS2'] if subfig_name == 'figS2' else \
+            self._subfig_cfgs[subfig_name]
+        # the cases of all corridors including their extended cases, whose specs provide colours and labels
+        return super()._get_dependencies(subfig_name) | {
+            'fuels': list(dict.fromkeys(
+                c.replace('-gwpOther', '')
+                for corr_specs in subcfg['showCorridors'].values()
+                for case, case_specs in corr_specs['cases'].items()
+                for c in [case] + list((case_specs or {}).get('extended', []))
+            )),
+        } | ({
+            'inputs': ['options', 'params_options', 'iea_data'],
+            'outputs': ['fullParams'],
+        } if subfig_name == 'figS2' else {})
+
     def plot(self, inputs: dict, outputs: dict, subfig_names: list) -> dict:
         ret = {}
 
@@ -241,10 +257,8 @@ class CostEmiOverTimePlot(BasePlot):
                 options = fuel_specs[c]['options'].copy()
                 options['gwp'] = 'gwp20' if options['gwp'] == 'gwp100' else 'gwp100'
                 ret.append(
-                    pd.DataFrame.from_records(
-                        calc_fuel(fuel_specs[c]['params'], c + '-gwpOther', fuel_specs[c]['type'], options,
-                                  plot_data.year.unique(), params_options)
-                    )
+                    calc_fuel(fuel_specs[c]['params'], c + '-gwpOther', fuel_specs[c]['type'], options,
+                              plot_data.year.unique(), params_options)
                 )
             else:
                 ret.append(
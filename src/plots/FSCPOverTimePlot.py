@@ -5,6 +5,7 @@ from plotly.colors import hex_to_rgb
 from plotly.subplots import make_subplots
 
 from src.proc_func.fscps import calc_fscps
+from src.proc_func.resample import resample_fuel_data
 from src.utils import load_yaml_plot_config_file
 from src.plots.BasePlot import BasePlot
 
@@ -12,6 +13,12 @@ from src.plots.BasePlot import BasePlot
 class FSCPOverTimePlot(BasePlot):
     figs, cfg = load_yaml_plot_config_file('FSCPOverTimePlot')
 
+    def _get_dependencies(self, subfig_name: str) -> dict:
+        return super()._get_dependencies(subfig_name) | {
+            'fuels': list(dict.fromkeys(f for fuels in self.cfg['selected_cases'].values() for f in fuels)),
+            'params': False,
+        }
+
     def plot(self, inputs: dict, outputs: dict, subfig_names: list) -> dict:
         if 'fig3' not in subfig_names and 'figS5' not in subfig_names:
             return {}
@@ -44,38 +51,18 @@ class FSCPOverTimePlot(BasePlot):
         plot_scatter = {}
         plot_interpolation = {}
 
-        for scid, fuels in selected_cases.items():
-            # insert interpolation points
-            t = np.linspace(fuel_data['year'].min(), fuel_data['year'].max(), self.cfg['n_samples'])
+        # interpolation points
+        t = np.linspace(fuel_data['year'].min(), fuel_data['year'].max(), self.cfg['n_samples'])
 
-            tmp = []
-            for f in fuels:
-                support = fuel_data \
-                    .query(f"fuel=='{f}'") \
-                    .reset_index(drop=True) \
-                    .astype({'year': float})
-
-                interpolation = dict(
-                    year=t,
-                    fuel=self.cfg['n_samples'] * [f],
-                    type=self.cfg['n_samples'] * [support.type.iloc[0]],
-                )
+        # resample every fuel only once and share it between the selected cases
+        resampled = {}
 
-                tmp.append(
-                    pd.merge(
-                        support,
-                        pd.DataFrame(interpolation, columns=support.keys()),
-                        on=['year', 'fuel', 'type'],
-                        how='outer',
-                        suffixes=('', '_drop'),
-                    )
-                    .sort_values(by=['year'])
-                    .reset_index(drop=True)
-                    .interpolate()
-                    .dropna(axis='columns')
-                )
+        for scid, fuels in selected_cases.items():
+            for f in fuels:
+                if f not in resampled:
+                    resampled[f] = resample_fuel_data(fuel_data, f, t)
 
-            fuel_data_interpolated = pd.concat(tmp)
+            fuel_data_interpolated = pd.concat([resampled[f] for f in fuels])
 
             # compute FSCPs
             plot_interpolation[scid] = calc_fscps(fuel_data_interpolated, calc_unc).assign(
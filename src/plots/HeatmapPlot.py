@@ -1,87 +1,103 @@
 import copy
+from functools import lru_cache
 
 import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 
+from src.proc_func.fuel_data_store import FuelDataStore
 from src.utils import load_yaml_plot_config_file
 from src.plots.BasePlot import BasePlot
 
 
+# names, applications, and plot types of subfigures
+_subfigs: list[tuple[str, str, str]] = [
+    (f"fig4{sub}" if application == 'heating' else f"figED2{sub}", application, plot_type)
+    for application in ['heating', 'steel']
+    for sub, plot_type in [('A', 'left'), ('B', 'right')]
+]
+
+
 class HeatmapPlot(BasePlot):
     figs, cfg = load_yaml_plot_config_file('HeatmapPlot')
 
+    def _get_dependencies(self, subfig_name: str) -> dict:
+        return super()._get_dependencies(subfig_name) | {
+            'fuels': list(dict.fromkeys(
+                list(self.cfg['refFuel'].values()) + [f for fuels in self.cfg['showFuels'].values() for f in fuels]
+            )),
+            'years': list(self.cfg['refYear'].values()) + self.cfg['showYears'],
+            'params': False,
+        }
+
     def plot(self, inputs: dict, outputs: dict, subfig_names: list) -> dict:
         ret = {}
-        for application in ['heating', 'steel']:
-            for sub, plot_type in [('A', 'left'), ('B', 'right')]:
-                subfig_name = f"fig4{sub}" if application == 'heating' else f"figED2{sub}"
-
-                # check if plotting is needed
-                if subfig_name not in subfig_names:
-                    ret.update({subfig_name: None})
-                    continue
-
-                # select data
-                plot_data, ref_data = self._select_plot_data(
-                    outputs['fuelData'],
-                    self.cfg['refFuel'][plot_type], self.cfg['refYear'][plot_type],
-                    self.cfg['showFuels'][plot_type], self.cfg['showYears'],
-                )
-
-                # throw away all components
-                plot_data = plot_data.drop(
-                    columns=plot_data.filter(regex=r"^(cost|ghgi)(_uu|_ul)?__.*$").columns.to_list(),
-                    axis=1,
-                )
-                ref_data = ref_data.drop(
-                    index=ref_data.filter(regex=r"^(cost|ghgi)(_uu|_ul)?__.*$").keys().to_list()
-                )
-
-                # add steel data for fig S4
-                if application == 'steel':
-                    steel = self.cfg['steelAssumptions']
-
-                    for t in [f"{comp}_{unc}" for comp in ['cost', 'ghgi'] for unc in ['uu', 'ul']]:
-                        plot_data[t] *= steel['idreaf_demand_h2']
-                    plot_data['cost'] += steel['idreaf_cost']
-
-                    ref_data['cost'] = steel['bfbof_cost']
-                    ref_data['ghgi'] = steel['bfbof_ghgi']
-
-                # define plotly figure
-                fig = go.Figure()
-
-                # produce figures
-                fig = self._produce_figure(fig, plot_data, ref_data, outputs['fuelSpecs'], plot_type, application)
-
-                ret.update({subfig_name: fig})
+        for subfig_name, application, plot_type in _subfigs:
+            # check if plotting is needed
+            if subfig_name not in subfig_names:
+                ret.update({subfig_name: None})
+                continue
 
-        return self.add_gwp_label(inputs['options']['gwp'], ret)
+            # select data
+            plot_data, ref_data, config = self._select_subfig_data(outputs['fuelDataStore'], application, plot_type)
 
-    def _select_plot_data(self, fuels_data: pd.DataFrame, ref_fuel: str, ref_year: int, show_fuels: list,
-                          show_years: list):
-        plot_data = fuels_data.query('fuel in @show_fuels and year in @show_years')
-        ref_data = fuels_data.query(f"fuel=='{ref_fuel}' & year=={ref_year}").iloc[0]
+            # define plotly figure
+            fig = go.Figure()
 
-        return plot_data, ref_data
+            # produce figures
+            fig = self._produce_figure(fig, plot_data, ref_data, config, outputs['fuelSpecs'], plot_type, application)
+
+            ret.update({subfig_name: fig})
 
-    def _produce_figure(self, fig: go.Figure, plot_data: pd.DataFrame, ref_data: pd.Series, fuel_specs: dict,
-                        plot_type: str, application: str):
+        return self.add_gwp_label(inputs['options']['gwp'], ret)
+
+    # compute the FSCP grids of the requested subfigures, so that they are memoised in the calling process
+    def prepare(self, inputs: dict, outputs: dict, subfig_names: list):
+        for subfig_name, application, plot_type in _subfigs:
+            if subfig_name in subfig_names:
+                _, ref_data, config = self._select_subfig_data(outputs['fuelDataStore'], application, plot_type)
+                _get_fscp_grid(ref_data, self._get_fscp_conf(config, application))
+
+    # select data of a subfigure (totals only, without components) and its config, scaled to the units of the plot
+    def _select_subfig_data(self, fuel_data_store: FuelDataStore, application: str, plot_type: str):
         config = self.cfg
+        plot_data, ref_data = self._select_plot_data(
+            fuel_data_store,
+            config['refFuel'][plot_type], config['refYear'][plot_type],
+            config['showFuels'][plot_type], config['showYears'],
+        )
+
+        # add steel data for fig S4
+        if application == 'steel':
+            steel = config['steelAssumptions']
+
+            for t in [f"{comp}_{unc}" for comp in ['cost', 'ghgi'] for unc in ['uu', 'ul']]:
+                plot_data[t] *= steel['idreaf_demand_h2']
+            plot_data['cost'] += steel['idreaf_cost']
+
+            ref_data['cost'] = steel['bfbof_cost']
+            ref_data['ghgi'] = steel['bfbof_ghgi']
 
         # apply scaling
         if application == 'heating':
             config = copy.deepcopy(config)
-            plot_data = plot_data.copy()
-            ref_data = ref_data.copy()
 
             config['plotting'][application]['ghgi_max'] *= 1000.0
             plot_data[['ghgi', 'ghgi_uu', 'ghgi_ul']] *= 1000.0
             ref_data[['ghgi', 'ghgi_uu', 'ghgi_ul']] *= 1000.0
 
-        # configure FSCP plotting
-        fscp_conf = {
+        return plot_data, ref_data, config
+
+    def _select_plot_data(self, fuel_data_store: FuelDataStore, ref_fuel: str, ref_year: int, show_fuels: list,
+                          show_years: list):
+        plot_data = fuel_data_store.totals(fuels=show_fuels, years=show_years)
+        ref_data = fuel_data_store.totals(fuels=[ref_fuel], years=[ref_year]).iloc[0]
+
+        return plot_data, ref_data
+
+    # configure FSCP plotting
+    def _get_fscp_conf(self, config: dict, application: str) -> dict:
+        return {
             'ghgi_min': 0.0,
             'ghgi_max': config['plotting'][application]['ghgi_max'],
             'cost_min': 0.0,
@@ -96,6 +112,10 @@ class HeatmapPlot(BasePlot):
                               '<i>FSCP</i><sub>BF-BOF→H<sub>2</sub>-DR</sub>'),
         }
 
+    def _produce_figure(self, fig: go.Figure, plot_data: pd.DataFrame, ref_data: pd.Series, config: dict,
+                        fuel_specs: dict, plot_type: str, application: str):
+        fscp_conf = self._get_fscp_conf(config, application)
+
         # add line traces
         traces = self._add_line_traces(plot_data, fuel_specs, config)
         for trace in traces:
@@ -259,14 +279,7 @@ class HeatmapPlot(BasePlot):
                          lw_ultrathin: float, showscale: bool):
         traces = []
 
-        ghgi_samples = np.linspace(fscp_conf['ghgi_min'], fscp_conf['ghgi_max'], fscp_conf['n_samples'])
-        cost_samples = np.linspace(fscp_conf['cost_min'], fscp_conf['cost_max'], fscp_conf['n_samples'])
-        ghgi_v, cost_v = np.meshgrid(ghgi_samples, cost_samples)
-
-        ghgi_ref = ref_data.ghgi
-        cost_ref = ref_data.cost
-
-        fscp = (cost_v - cost_ref) / (ghgi_ref - ghgi_v) * fscp_conf['fscp_scaling']
+        ghgi_samples, cost_samples, fscp = _get_fscp_grid(ref_data, fscp_conf)
 
         # heatmap
         tickvals = [fscp_conf['zdticks'] * i for i in range(int(fscp_conf['zmax'] / fscp_conf['zdticks']) + 1)]
@@ -342,3 +355,29 @@ class HeatmapPlot(BasePlot):
                 )))
 
         return traces
+
+
+# FSCP surface over a grid of GHGI and cost samples with respect to a reference point
+def _get_fscp_grid(ref_data: pd.Series, fscp_conf: dict) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return _calc_fscp_grid(
+        float(ref_data.cost), float(ref_data.ghgi),
+        fscp_conf['ghgi_min'], fscp_conf['ghgi_max'], fscp_conf['cost_min'], fscp_conf['cost_max'],
+        fscp_conf['n_samples'], fscp_conf['fscp_scaling'],
+    )
+
+
+# Grids are memoised and returned as read-only arrays, as the same reference points and grid specs recur across
+# subfigures and updates. Plot groups fill the memo in the parent process before forking (see prepare), so that it is
+# inherited by the workers.
+@lru_cache(maxsize=32)
+def _calc_fscp_grid(cost_ref: float, ghgi_ref: float, ghgi_min: float, ghgi_max: float, cost_min: float,
+                    cost_max: float, n_samples: int, fscp_scaling: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    ghgi_samples = np.linspace(ghgi_min, ghgi_max, n_samples)
+    cost_samples = np.linspace(cost_min, cost_max, n_samples)
+
+    fscp = (cost_samples[:, np.newaxis] - cost_ref) / (ghgi_ref - ghgi_samples[np.newaxis, :]) * fscp_scaling
+
+    for a in (ghgi_samples, cost_samples, fscp):
+        a.flags.writeable = False
+
+    return ghgi_samples, cost_samples, fscp
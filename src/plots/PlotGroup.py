@@ -0,0 +1,159 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import plotly.graph_objects as go
+
+from src.plots.BasePlot import BasePlot
+
+
+# inputs and outputs shared with forked worker processes, so they are inherited rather than pickled for every task
+_shared: Optional[tuple] = None
+
+
+# Group of independent plot classes that are registered with the webapp as one plot. For export, the plots of the
+# group are produced concurrently in a pool of forked worker processes, which inherit the processed outputs from the
+# parent. In the webapp, they are produced one after the other in the calling thread.
+# Figures are decorated in the parent process by the plot that produced them. Subfigures are only rebuilt if the data
+# they depend on (as declared by their plot) changed since they were last built.
+class PlotGroup(BasePlot):
+    figs: dict = {}
+    cfg: dict = {}
+    _plot_classes: list = []
+    _max_workers: Optional[int] = None
+
+    # figures decorated for print since the last reset and their dpi, collected over all calls of _decorate and all
+    # instances of a group class (each group class gets its own dict in of()), so they can be rendered outside the
+    # webapp
+    _printed: dict = {}
+    _printed_dpi: Optional[float] = None
+
+    # create a group from a list of plot classes
+    @classmethod
+    def of(cls, *plot_classes: type, max_workers: Optional[int] = None) -> type:
+        return type(cls.__name__, (cls,), {
+            'figs': {fig_name: fig for plot_class in plot_classes for fig_name, fig in plot_class.figs.items()},
+            'cfg': {},
+            '_plot_classes': list(plot_classes),
+            '_max_workers': max_workers,
+            '_printed': {},
+        })
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._plots: list[BasePlot] = [plot_class(*args, **kwargs) for plot_class in self._plot_classes]
+        self._subfig_owners: dict[str, int] = {
+            subfig_name: k
+            for k, plot in enumerate(self._plots)
+            for subfig_name in get_subfig_names(plot.figs)
+        }
+
+        # subfigures last built (as dicts, before decoration), along with the fingerprint of their dependencies
+        self._fig_cache: dict[str, tuple[str, dict]] = {}
+
+    def plot(self, inputs: dict, outputs: dict, subfig_names: list) -> dict:
+        # only rebuild subfigures whose dependencies changed since they were last built
+        fingerprints = {
+            subfig_name: self._plots[self._subfig_owners[subfig_name]].get_fingerprint(inputs, outputs, subfig_name)
+            for subfig_name in subfig_names
+            if subfig_name in self._subfig_owners
+        }
+        stale = [
+            subfig_name
+            for subfig_name, fingerprint in fingerprints.items()
+            if subfig_name not in self._fig_cache or self._fig_cache[subfig_name][0] != fingerprint
+        ]
+
+        built = self._build(inputs, outputs, stale)
+        for subfig_name in stale:
+            if built.get(subfig_name) is not None:
+                self._fig_cache[subfig_name] = (fingerprints[subfig_name], built[subfig_name].to_dict())
+
+        # figures are decorated after plotting, so cached figures are handed out as fresh copies (rebuilt from dicts of
+        # valid figures, which is faster than unpickling)
+        return built | {
+            subfig_name: go.Figure(self._fig_cache[subfig_name][1], skip_invalid=True)
+            for subfig_name in fingerprints
+            if subfig_name not in stale
+        }
+
+    def _build(self, inputs: dict, outputs: dict, subfig_names: list) -> dict:
+        tasks = [
+            (k, [s for s in subfig_names if self._subfig_owners.get(s) == k])
+            for k in range(len(self._plots))
+        ]
+        tasks = [(k, names) for k, names in tasks if names]
+
+        # run in this process if there is nothing to parallelise or forking is not supported, and always in the webapp,
+        # where forking from the threads of the Flask server could deadlock and would be paid on every callback
+        max_workers = min(len(tasks), self._max_workers or os.cpu_count() or 1)
+        if self._target == 'webapp' or max_workers < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+            return {
+                subfig_name: subfig
+                for k, names in tasks
+                for subfig_name, subfig in self._plots[k].plot(inputs, outputs, names).items()
+            }
+
+        # fill memos in this process, so that all workers inherit them
+        for k, names in tasks:
+            self._plots[k].prepare(inputs, outputs, names)
+
+        global _shared
+        _shared = (self._plots, inputs, outputs)
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                results = list(pool.map(_run_plot, tasks))
+        finally:
+            _shared = None
+
+        return {subfig_name: subfig for ret in results for subfig_name, subfig in ret.items()}
+
+    def _decorate(self, inputs: dict, outputs: dict, subfigs: dict):
+        for k, plot in enumerate(self._plots):
+            plot_subfigs = {
+                subfig_name: subfig
+                for subfig_name, subfig in subfigs.items()
+                if self._subfig_owners.get(subfig_name) == k
+            }
+            if plot_subfigs:
+                plot._decorate(inputs, outputs, plot_subfigs)
+
+        if self._target != 'webapp':
+            self._printed.update({subfig_name: subfig for subfig_name, subfig in subfigs.items() if subfig is not None})
+            type(self)._printed_dpi = self._dpi
+
+    # discard figures collected for print, e.g. before starting an export
+    @classmethod
+    def reset_printed(cls):
+        cls._printed.clear()
+        cls._printed_dpi = None
+
+    # figures decorated for print since the last reset and their dpi
+    @classmethod
+    def get_printed(cls) -> tuple[dict, Optional[float]]:
+        return dict(cls._printed), cls._printed_dpi
+
+
+# get names of subfigures from figure specs (figures without subfigures are their own subfigure)
+def get_subfig_names(figs: dict) -> list[str]:
+    return [
+        subfig_name
+        for fig_name, fig in figs.items()
+        for subfig_name in (fig['subfigs'] if 'subfigs' in fig else [fig_name])
+    ]
+
+
+# get print sizes (in mm) of subfigures from figure specs
+def get_print_sizes(figs: dict) -> dict[str, dict]:
+    return {
+        subfig_name: subfig['size']['print']
+        for fig_name, fig in figs.items()
+        for subfig_name, subfig in (fig['subfigs'].items() if 'subfigs' in fig else [(fig_name, fig)])
+    }
+
+
+def _run_plot(task: tuple) -> dict:
+    k, subfig_names = task
+    plots, inputs, outputs = _shared
+    return plots[k].plot(inputs, outputs, subfig_names)
@@ -4,9 +4,7 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from plotly.colors import hex_to_rgb
 
-from src.proc_func.cost import eval_cost, params_cost
-from src.proc_func.ghgi import eval_ghgi, params_ghgi
-from src.proc_func.helper import ParameterHandler
+from src.proc_func.sensitivity import calc_sensitivity
 from src.utils import load_yaml_plot_config_file
 from src.plots.BasePlot import BasePlot
 
@@ -14,6 +12,14 @@ from src.plots.BasePlot import BasePlot
 class SensitivityPlot(BasePlot):
     figs, cfg = load_yaml_plot_config_file('SensitivityPlot')
 
+    def _get_dependencies(self, subfig_name: str) -> dict:
+        return super()._get_dependencies(subfig_name) | {
+            'fuels': list(dict.fromkeys(
+                f for pair in self._subfig_cfgs[subfig_name]['fuels'] for f in pair.split(' to ')
+            )),
+            'years': self.cfg['years'],
+        }
+
     def plot(self, inputs: dict, outputs: dict, subfig_names: list) -> dict:
         if 'fig5' not in subfig_names and 'figS7' not in subfig_names:
             return {}
@@ -45,6 +51,13 @@ class SensitivityPlot(BasePlot):
             column_widths=num_sensitivity_plots * [(1.0 - last_col_width) / num_sensitivity_plots] + [last_col_width],
         )
 
+        # evaluate sensitivities of all pairs, years, and parameters at once
+        sensitivity = calc_sensitivity(
+            outputs['fuelSpecs'], [tuple(f.split(' to ')) for f in fuels], self.cfg['years'],
+            self.cfg['sensitivity_params'], self.cfg['n_samples'], inputs['params_options'],
+        )
+        sensitivity = dict(list(sensitivity.groupby(['fuel_a', 'fuel_b', 'year', 'param'], sort=False)))
+
         # loop over fuels
         has_vline = []
         has_legend = []
@@ -54,24 +67,14 @@ class SensitivityPlot(BasePlot):
         for fid, fuel_a, fuel_b, year in [(fid, *f.split(' to '), y)
                                           for fid, f in enumerate(fuels)
                                           for y in self.cfg['years']]:
-            type_a = outputs['fuelSpecs'][fuel_a]['type']
-            type_b = outputs['fuelSpecs'][fuel_b]['type']
-
-            pars = {
-                fuel: _get_fuel_pars(
-                    outputs['fuelSpecs'][fuel]['params'],
-                    outputs['fuelSpecs'][fuel]['type'],
-                    outputs['fuelSpecs'][fuel]['options'],
-                    year, inputs['params_options']
-                ) for fuel in [fuel_a, fuel_b]
-            }
-
             for j, item in enumerate(self.cfg['sensitivity_params'].items()):
                 var, settings = item
 
-                # get linspaces for parameters, x, and y
-                x, ps, val = _calc_linspace(var, settings, self.cfg['n_samples'], *pars[fuel_a], *pars[fuel_b])
-                fscp = _get_fscp(*ps, type_a, type_b)
+                # get x and y of sensitivity line and default values
+                this_data = sensitivity[fuel_a, fuel_b, year, var]
+                x = this_data['x'].to_numpy()
+                fscp = this_data['fscp'].to_numpy().copy()
+                val = this_data['default'].iloc[0]
 
                 # save for creation of filled area
                 all_lines[var]['x'] = x
@@ -109,7 +112,7 @@ class SensitivityPlot(BasePlot):
                     val = 0.0
 
                 # add markers
-                fscp = _get_fscp(*pars[fuel_a], *pars[fuel_b], type_a, type_b)
+                fscp = this_data['fscp_default'].iloc[0]
                 fig.add_trace(
                     go.Scatter(
                         x=[val * settings['scale']],
@@ -302,59 +305,6 @@ class SensitivityPlot(BasePlot):
         return fig
 
 
-def _get_fuel_pars(params: pd.DataFrame, fuel_type: str, options: dict, year: int, params_options: dict):
-    current_params = params.query(f"year=={year}").droplevel(level=1)
-    param_handler = ParameterHandler(current_params, params_options)
-
-    p_c = params_cost(param_handler, fuel_type, options)
-    p_g = params_ghgi(param_handler, fuel_type, options)
-
-    return p_c, p_g
-
-
-def _calc_linspace(var, settings, n, *ps):
-    ps = list(ps)
-
-    x = np.linspace(*settings['range'], n)
-
-    for k in [i for i in range(4) if var in ps[i]]:
-        val = ps[k][var]
-        has_uncertainty = isinstance(val, tuple)
-
-        if has_uncertainty:
-            val = val[0]
-
-        ps[k] = ps[k].copy()
-
-        if settings['mode'] == 'absolute':
-            xplot = x
-        elif settings['mode'] == 'relative':
-            xplot = np.linspace(val + settings['range'][0], val + settings['range'][1], n)
-        else:
-            raise Exception(f"Unknown mode selected for variable {var}: {settings['mode']}")
-
-        ps[k][var] = (xplot, 0.0, 0.0) if has_uncertainty else xplot
-
-    return x, ps, val
-
-
-def _get_fscp(p_ac, p_ag, p_bc, p_bg, type_a, type_b):
-    cost_a = eval_cost(p_ac, type_a)
-    ghgi_a = eval_ghgi(p_ag, type_a)
-    cost_b = eval_cost(p_bc, type_b)
-    ghgi_b = eval_ghgi(p_bg, type_b)
-
-    cost_diff = sum(cost_b[comp]['val'] for comp in cost_b) - sum(cost_a[comp]['val'] for comp in cost_a)
-    ghgi_diff = sum(ghgi_a[comp]['val'] for comp in ghgi_a) - sum(ghgi_b[comp]['val'] for comp in ghgi_b)
-
-    if isinstance(cost_diff, np.ndarray):
-        fscp = np.maximum(cost_diff, [0.0] * len(cost_diff)) / ghgi_diff
-    else:
-        fscp = max(cost_diff, 0.0) / ghgi_diff
-
-    return fscp
-
-
 def _get_co2_prices(co2price_traj, years):
     co2prices_show = []
 
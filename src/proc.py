@@ -1,24 +1,81 @@
+import copy
+import threading
+
+from src.cache import ResultCache
+from src.proc_func.fuel_data_store import FuelDataStore
 from src.proc_func.fuels import calc_fuel_data
 from src.proc_func.params import get_full_params
 
 
+# cache of processed outputs, keyed by the contents of the inputs they depend on
+proc_cache = ResultCache(maxsize=32)
+
+# fingerprints, fuels, and outputs of the last call, used to only recompute the fuel cases affected by an edit of the
+# fuels; guarded by a lock, as the webapp may process inputs in several threads at once
+_prev: dict = {}
+_prev_lock = threading.Lock()
+
+
 # process inputs into outputs
 def process_inputs(inputs: dict, outputs: dict):
+    global _prev
+
     options, params, params_options, fuels, units = (inputs['options'], inputs['params'], inputs['params_options'],
                                                      inputs['fuels'], inputs['units'])
     times, gwp = options['times'], options['gwp']
 
-    # convert basic inputs to complete dataframes
-    print('Getting full list of parameters...')
-    full_params = get_full_params(params, units, times)
+    # return cached outputs if these inputs have been processed before
+    key = ResultCache.key(options, params, params_options, fuels, units)
+    cached = proc_cache.get(key)
+    if cached is not None:
+        full_params, fuel_specs, fuel_data_store = cached
+
+        # the wide fuel data is rebuilt from the store as a new frame, so it needs no copy
+        fuel_data = fuel_data_store.wide()
+    else:
+        # reuse results of the last call if only the fuels changed, or all of them if nothing changed
+        base_key = ResultCache.key(options, params, params_options, units)
+        with _prev_lock:
+            prev = _prev if _prev and _prev['baseKey'] == base_key else None
+
+        if prev is not None and prev['key'] == key:
+            full_params, fuel_specs, fuel_data = prev['fullParams'], prev['fuelSpecs'], prev['fuelData']
+        else:
+            # convert basic inputs to complete dataframes
+            if prev is not None:
+                full_params = prev['fullParams']
+            else:
+                print('Getting full list of parameters...')
+                full_params = get_full_params(params, units, times)
+
+            # calculate fuel data
+            print('Calculating fuel cost and GHGI data...')
+            fuel_data, fuel_specs = calc_fuel_data(times, full_params, fuels, params, gwp, params_options, units, prev)
+
+        # cached fuel data is kept in the compact store
+        fuel_data_store = FuelDataStore.from_frame(fuel_data)
+        proc_cache.put(key, (full_params, fuel_specs, fuel_data_store))
+        with _prev_lock:
+            _prev = {
+                'key': key,
+                'baseKey': base_key,
+                'fuels': copy.deepcopy(fuels),
+                'fullParams': full_params,
+                'fuelSpecs': fuel_specs,
+                'fuelData': fuel_data,
+            }
 
-    # calculate fuel data
-    print('Calculating fuel cost and GHGI data...')
-    fuel_data, fuel_specs = calc_fuel_data(times, full_params, fuels, params, gwp, params_options, units)
+        # the fuel data kept for the next call is not handed out
+        fuel_data = fuel_data.copy()
 
-    # return all output data
+    # return all output data (copies, so that the cached entries cannot be changed by later steps, including the
+    # params frames and options dicts of the fuel specs; the fuel data store is read-only and hence shared)
     outputs |= {
-        'fullParams': full_params,
-        'fuelSpecs': fuel_specs,
+        'fullParams': full_params.copy(),
+        'fuelSpecs': {
+            fuel_id: specs | {'params': specs['params'].copy(), 'options': specs['options'].copy()}
+            for fuel_id, specs in fuel_specs.items()
+        },
         'fuelData': fuel_data,
+        'fuelDataStore': fuel_data_store,
     }
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+from src.proc_func.cost import eval_cost, params_cost
+from src.proc_func.ghgi import eval_ghgi, params_ghgi
+from src.proc_func.helper import ParameterHandler, ParameterStore
+from src.proc_func.sensitivity import eval_sweep
+
+
+# Break-even values of a parameter of the cost and GHGI formulas (e.g. p_ng, p_el, mlr), at which the FSCP of switching
+# from fuel a to fuel b equals a target (in EUR/tCO2), for all pairs of fuels and years at once. The parameter is set to
+# the same value in both fuels while all other parameters are kept at their defaults (as in calc_sensitivity). Only
+# break-even values within the bracket (lower and upper bound of the parameter) are returned, otherwise NaN.
+def calc_breakeven_fscp(fuel_specs: dict, pairs: list[tuple[str, str]], years: list, param: str, target: float,
+                        bracket: tuple[float, float], params_options: dict, xtol: float = 1e-9,
+                        max_iter: int = 100) -> pd.DataFrame:
+    return _calc_breakeven(fuel_specs, pairs, years, param, target, bracket, params_options, xtol, max_iter,
+                           require_reduction=True)
+
+
+# Break-even values of a parameter at which the cost of fuel b equals the cost of fuel a, analogous to
+# calc_breakeven_fscp.
+def calc_breakeven_parity(fuel_specs: dict, pairs: list[tuple[str, str]], years: list, param: str,
+                          bracket: tuple[float, float], params_options: dict, xtol: float = 1e-9,
+                          max_iter: int = 100) -> pd.DataFrame:
+    return _calc_breakeven(fuel_specs, pairs, years, param, 0.0, bracket, params_options, xtol, max_iter,
+                           require_reduction=False)
+
+
+# Solve cost_b - cost_a - target * (ghgi_a - ghgi_b) = 0 for the parameter, with arrays of shape (year x pair). Where
+# this difference is linear in the parameter within the bracket (checked at the bounds and the midpoint), the
+# break-even value is obtained in closed form and accepted if the difference vanishes there, otherwise it is obtained by
+# bisection of all remaining years and pairs at once.
+def _calc_breakeven(fuel_specs: dict, pairs: list[tuple[str, str]], years: list, param: str, target: float,
+                    bracket: tuple[float, float], params_options: dict, xtol: float, max_iter: int,
+                    require_reduction: bool) -> pd.DataFrame:
+    diff = _Difference(fuel_specs, pairs, years, param, params_options)
+    shape = (len(years), len(pairs))
+
+    lo = np.full(shape, float(min(bracket)))
+    hi = np.full(shape, float(max(bracket)))
+    mid = 0.5 * (lo + hi)
+    g_lo, g_hi, g_mid = (diff.cost(x) - target * diff.ghgi(x) for x in (lo, hi, mid))
+
+    # break-even values exist within the bracket where the difference changes sign
+    found = (np.sign(g_lo) * np.sign(g_hi) <= 0.0) & np.isfinite(g_lo) & np.isfinite(g_hi)
+
+    # closed form where linear, accepted only if the difference vanishes at the root obtained (the check at the midpoint
+    # alone can be passed by nonlinear differences)
+    scale = np.fmax(abs(g_lo), abs(g_hi))
+    linear = found & np.isclose(g_mid, 0.5 * (g_lo + g_hi), rtol=1e-9, atol=1e-12 * scale)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = np.where(g_hi == g_lo, lo, lo - g_lo * (hi - lo) / (g_hi - g_lo))
+    x = np.where(linear, value, lo)
+    g_value = diff.cost(x) - target * diff.ghgi(x)
+    linear &= np.abs(g_value) <= 1e-9 * scale
+
+    # bisection elsewhere
+    bisect = found & ~linear
+    if bisect.any():
+        a, b, g_a = lo.copy(), hi.copy(), g_lo.copy()
+        for _ in range(max_iter):
+            m = 0.5 * (a + b)
+            g_m = diff.cost(m) - target * diff.ghgi(m)
+            left = np.sign(g_m) == np.sign(g_a)
+            a, g_a = np.where(left, m, a), np.where(left, g_m, g_a)
+            b = np.where(left, b, m)
+            if np.all((b - a)[bisect] <= xtol * (1.0 + np.abs(m[bisect]))):
+                break
+        value = np.where(bisect, 0.5 * (a + b), value)
+
+    value = np.where(found, value, np.nan)
+
+    # an FSCP is only defined if switching reduces emissions
+    if require_reduction:
+        value = np.where(diff.ghgi(np.where(found, value, lo)) > 0.0, value, np.nan)
+
+    n_years, n_pairs = shape
+    return pd.DataFrame({
+        'fuel_a': np.tile([fuel_a for fuel_a, _ in pairs], n_years),
+        'fuel_b': np.tile([fuel_b for _, fuel_b in pairs], n_years),
+        'year': np.repeat(years, n_pairs),
+        'param': param,
+        'target': target,
+        'value': value.ravel(),
+        'default': diff.defaults.ravel(),
+        'method': np.where(linear, 'closed_form', np.where(bisect, 'bisection', None)).ravel(),
+    })
+
+
+# differences of cost (b - a) and GHGI (a - b) of all pairs of fuels for values of the parameter given as arrays of
+# shape (year x pair)
+class _Difference:
+    def __init__(self, fuel_specs: dict, pairs: list[tuple[str, str]], years: list, param: str,
+                 params_options: dict):
+        self._pairs = pairs
+        self._n_years = len(years)
+        self._sweeps = {param: {'mode': 'absolute'}}
+
+        self._params = {}
+        defaults = {}
+        for fuel in dict.fromkeys(f for pair in pairs for f in pair):
+            param_handler = ParameterHandler(ParameterStore(fuel_specs[fuel]['params']), params_options,
+                                             year=list(years))
+            fuel_type, options = fuel_specs[fuel]['type'], fuel_specs[fuel]['options']
+            self._params[fuel] = (fuel_type, params_cost(param_handler, fuel_type, options),
+                                  params_ghgi(param_handler, fuel_type, options))
+
+            for p in self._params[fuel][1:]:
+                if param in p:
+                    value = p[param][0] if isinstance(p[param], tuple) else p[param]
+                    defaults[fuel] = np.broadcast_to(value, self._n_years)
+
+        # default values are taken from the last of the two fuels containing the parameter
+        self.defaults: np.ndarray = np.stack([
+            defaults.get(fuel_b, defaults.get(fuel_a, np.full(self._n_years, np.nan)))
+            for fuel_a, fuel_b in pairs
+        ], axis=1)
+
+    def cost(self, x: np.ndarray) -> np.ndarray:
+        totals = self._eval(x, 1, eval_cost)
+        return np.stack([totals[fuel_b][:, k] - totals[fuel_a][:, k] for k, (fuel_a, fuel_b) in enumerate(self._pairs)],
+                        axis=1)
+
+    def ghgi(self, x: np.ndarray) -> np.ndarray:
+        totals = self._eval(x, 2, eval_ghgi)
+        return np.stack([totals[fuel_a][:, k] - totals[fuel_b][:, k] for k, (fuel_a, fuel_b) in enumerate(self._pairs)],
+                        axis=1)
+
+    # totals of every fuel with the parameter set to x, of shape (year x pair)
+    def _eval(self, x: np.ndarray, i: int, eval_func) -> dict[str, np.ndarray]:
+        shape = (self._n_years, 1, x.shape[1])
+        return {
+            fuel: eval_sweep(p[i], eval_func, p[0], self._sweeps, {param: x for param in self._sweeps}, shape)[0][:, 0]
+            for fuel, p in self._params.items()
+        }
+
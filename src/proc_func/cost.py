@@ -4,9 +4,9 @@ from src.proc_func.helper import ParameterHandler, simple_ret_val_unc
 known_blue_techs = ['smr-ccs-56%', 'atr-ccs-93%', 'atr-ccs-93%-lowscco2']
 
 
-def calc_cost(param_handler: ParameterHandler, fuel_type: str, options: dict):
+def calc_cost(param_handler: ParameterHandler, fuel_type: str, options: dict, calc_unc: bool = True):
     p = params_cost(param_handler, fuel_type, options)
-    return eval_cost(p, fuel_type)
+    return eval_cost(p, fuel_type, calc_unc)
 
 
 def params_cost(param_handler: ParameterHandler, fuel_type: str, options: dict):
@@ -20,13 +20,13 @@ def params_cost(param_handler: ParameterHandler, fuel_type: str, options: dict):
         raise Exception(f"Unknown fuel: {fuel_type}")
 
 
-def eval_cost(p, fuel_type: str):
+def eval_cost(p, fuel_type: str, calc_unc: bool = True):
     if fuel_type == 'NG':
-        return get_cost_ng(**p)
+        return get_cost_ng(**p, calc_unc=calc_unc)
     elif fuel_type == 'BLUE':
-        return get_cost_blue(**p)
+        return get_cost_blue(**p, calc_unc=calc_unc)
     elif fuel_type == 'GREEN':
-        return get_cost_green(**p)
+        return get_cost_green(**p, calc_unc=calc_unc)
     else:
         raise Exception(f"Unknown fuel: {fuel_type}")
 
@@ -1,78 +1,75 @@
 import re
 
+import numpy as np
 import pandas as pd
 
 
-def calc_fscps(fuel_data: pd.DataFrame, calc_unc: bool = True):
-    fuel_data_cross = fuel_data.assign(code=lambda r: r.type.map({'NG': 0, 'BLUE': 1, 'GREEN': 2}))
-
-    fuel_data_cross = fuel_data_cross.merge(fuel_data_cross, on='year', how='outer', suffixes=('_x', '_y'))\
-        .query(f"code_y < code_x")\
-        .drop(columns=['code_x', 'code_y'])\
-        .sort_values(by=['fuel_x', 'fuel_y', 'year'])\
-        .reset_index(drop=True)
-
-    return calc_fscp_from_cost_and_ghgi(fuel_data_cross, calc_unc)
-
-
-def calc_fscp_from_cost_and_ghgi(fuel_data_cross: pd.DataFrame, calc_unc: bool = True):
-    # calc cost diff and ghgi diff
-    fuel_data_cross['cost_diff'] = fuel_data_cross['cost_x'] - fuel_data_cross['cost_y']
-    fuel_data_cross['ghgi_diff'] = fuel_data_cross['ghgi_y'] - fuel_data_cross['ghgi_x']
-
-    # calc FSCPs from above diffs
-    fuel_data_cross['fscp'] = fuel_data_cross['cost_diff'] / fuel_data_cross['ghgi_diff']
-
-    # only proceed if uncertainty needs to be calculated
-    if not calc_unc:
-        return fuel_data_cross[[
-            'year',
-            'fuel_x', 'type_x', 'fuel_y', 'type_y',
-            'cost_x', 'cost_y', 'cost_uu_x', 'cost_uu_y', 'cost_ul_x', 'cost_ul_y',
-            'ghgi_x', 'ghgi_y', 'ghgi_uu_x', 'ghgi_uu_y', 'ghgi_ul_x', 'ghgi_ul_y',
-            'fscp',
-        ]]
-
-    # find all parameters with uncertainty
-    pat = re.compile(r"^(cost|ghgi)_(uu|ul)__(.*)_[xy]")
-    pnames = []
-    for component_col_name in fuel_data_cross.columns:
-        m = pat.match(component_col_name)
-        if m is not None:
-            pname = m.group(3)
-            if pname not in pnames:
-                pnames.append(pname)
+fuel_type_codes = {'NG': 0, 'BLUE': 1, 'GREEN': 2}
 
-    # compute upper and lower uncertainties
-    uts = ['uu', 'ul']
-    for ut_this in uts:
-        ut_other = next(uto for uto in uts if uto != ut_this)
 
-        for pname in pnames:
-            new_col_name = f"fscp_{ut_this}__{pname}"
-            fuel_data_cross[new_col_name] = 0.0
-
-            for mode in ['cost', 'ghgi']:
-                for suffix in ['x', 'y']:
-                    ut_comp = ut_this if suffix == 'x' else ut_other
-                    component_col_name = f"{mode}_{ut_comp}__{pname}_{suffix}"
-
-                    if component_col_name not in fuel_data_cross.columns:
-                        continue
-
-                    fuel_data_cross[new_col_name] += ((+1 if suffix == 'x' else -1) *
-                                                      fuel_data_cross[component_col_name].fillna(0.0) /
-                                                      fuel_data_cross[f"{mode}_diff"])
-
-        fuel_data_cross[f"fscp_{ut_this}"] = (
-                fuel_data_cross['fscp'] *
-                fuel_data_cross[[f"fscp_{ut_this}__{pname}" for pname in pnames]].pow(2).sum(axis=1).pow(1 / 2)
-        )
-
-    return fuel_data_cross[[
+def calc_fscps(fuel_data: pd.DataFrame, calc_unc: bool = True):
+    # find row indices of all pairs of fuels in the same year where fuel y has a lower type code than fuel x
+    rows = pd.DataFrame({
+        'year': fuel_data['year'].to_numpy(),
+        'fuel': fuel_data['fuel'].to_numpy(),
+        'code': fuel_data['type'].map(fuel_type_codes).to_numpy(),
+        'row': np.arange(len(fuel_data)),
+    })
+    pairs = rows.merge(rows, on='year', suffixes=('_x', '_y'))
+    pairs = pairs[pairs['code_y'] < pairs['code_x']].sort_values(by=['fuel_x', 'fuel_y', 'year'])
+
+    return calc_fscp_from_cost_and_ghgi(fuel_data, pairs['row_x'].to_numpy(), pairs['row_y'].to_numpy(), calc_unc)
+
+
+# compute FSCPs of pairs of rows (ix, iy) of fuel data, where x is the fuel switched to and y the fuel switched from
+def calc_fscp_from_cost_and_ghgi(fuel_data: pd.DataFrame, ix: np.ndarray, iy: np.ndarray, calc_unc: bool = True):
+    ret = {
+        'year': fuel_data['year'].to_numpy()[ix],
+        'fuel_x': fuel_data['fuel'].to_numpy()[ix],
+        'type_x': fuel_data['type'].to_numpy()[ix],
+        'fuel_y': fuel_data['fuel'].to_numpy()[iy],
+        'type_y': fuel_data['type'].to_numpy()[iy],
+    }
+    for col in ['cost', 'cost_uu', 'cost_ul', 'ghgi', 'ghgi_uu', 'ghgi_ul']:
+        ret[f"{col}_x"] = fuel_data[col].to_numpy()[ix]
+        ret[f"{col}_y"] = fuel_data[col].to_numpy()[iy]
+
+    # calc cost diff and ghgi diff and FSCPs from them
+    diffs = {
+        'cost': ret['cost_x'] - ret['cost_y'],
+        'ghgi': ret['ghgi_y'] - ret['ghgi_x'],
+    }
+    ret['fscp'] = diffs['cost'] / diffs['ghgi']
+
+    cols = [
         'year',
         'fuel_x', 'type_x', 'fuel_y', 'type_y',
         'cost_x', 'cost_y', 'cost_uu_x', 'cost_uu_y', 'cost_ul_x', 'cost_ul_y',
         'ghgi_x', 'ghgi_y', 'ghgi_uu_x', 'ghgi_uu_y', 'ghgi_ul_x', 'ghgi_ul_y',
-        'fscp', 'fscp_uu', 'fscp_ul',
-    ]]
+        'fscp',
+    ]
+
+    # only proceed if uncertainty needs to be calculated
+    if not calc_unc:
+        return pd.DataFrame(ret, columns=cols)
+
+    # find all parameters with uncertainty and collect their components as (mode x uncertainty type x row x param)
+    pat = re.compile(r"^(cost|ghgi)_(uu|ul)__(.*)$")
+    matches = [(m.group(1), m.group(2), m.group(3), col) for col in fuel_data.columns if (m := pat.match(col))]
+    pnames = list(dict.fromkeys(pname for *_, pname, _ in matches))
+    modes, uts = ['cost', 'ghgi'], ['uu', 'ul']
+
+    components = np.zeros((len(modes), len(uts), len(fuel_data), len(pnames)))
+    for mode, ut, pname, col in matches:
+        components[modes.index(mode), uts.index(ut), :, pnames.index(pname)] = fuel_data[col].fillna(0.0).to_numpy()
+
+    # compute upper and lower uncertainties from the relative contributions of all parameters
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for k, ut in enumerate(uts):
+            contributions = sum(
+                (components[m, k][ix] - components[m, 1 - k][iy]) / diffs[mode][:, np.newaxis]
+                for m, mode in enumerate(modes)
+            )
+            ret[f"fscp_{ut}"] = ret['fscp'] * np.sqrt(np.nansum(contributions ** 2, axis=1))
+
+    return pd.DataFrame(ret, columns=cols + ['fscp_uu', 'fscp_ul'])
@@ -0,0 +1,137 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+# columns of fuel data with totals of cost and GHGI and their uncertainties
+total_cols = ['cost', 'cost_uu', 'cost_ul', 'ghgi', 'ghgi_uu', 'ghgi_ul']
+
+
+# Compact columnar container of fuel data. Rows (fuel cases and years) are identified by categorical fuel and type
+# codes and small-int years. Totals are kept as one contiguous float array per column, from which frames are built
+# without copying. Components and parameter-specific uncertainty contributions (the columns of the wide fuel data
+# containing a double underscore, which are NaN for all parameters a fuel type does not use) are kept per fuel type as
+# a block of only the columns used by the type. All arrays are read-only, so a store can be shared between callers.
+class FuelDataStore:
+    def __init__(self, fuels: pd.Categorical, types: pd.Categorical, years: np.ndarray, totals: np.ndarray,
+                 part_names: list[str], part_blocks: list[tuple[np.ndarray, np.ndarray, np.ndarray]],
+                 columns: list[str]):
+        self._fuels = fuels
+        self._types = types
+        self._years = years
+        self._totals = totals
+        self._part_names = part_names
+        self._part_blocks = part_blocks
+        self._columns = columns
+
+        for arr in [years, totals] + [arr for block in part_blocks for arr in block]:
+            arr.flags.writeable = False
+
+    # build store from wide fuel data as returned by calc_fuel_data
+    @classmethod
+    def from_frame(cls, fuel_data: pd.DataFrame) -> 'FuelDataStore':
+        missing = [col for col in ['fuel', 'type', 'year'] + total_cols if col not in fuel_data.columns]
+        if missing:
+            raise Exception(f"Fuel data is missing columns: {', '.join(missing)}")
+
+        types = pd.Categorical(fuel_data['type'], categories=list(dict.fromkeys(fuel_data['type'])))
+        part_names = [col for col in fuel_data.columns if '__' in col]
+        parts = fuel_data[part_names].to_numpy(dtype=np.float64)
+
+        # rows of each type, columns defined for any of these rows, and their values
+        part_blocks = []
+        for code in range(len(types.categories)):
+            rows = np.flatnonzero(types.codes == code)
+            cols = np.flatnonzero((~np.isnan(parts[rows])).any(axis=0))
+            part_blocks.append((rows.astype(np.int32), cols.astype(np.int16), parts[np.ix_(rows, cols)]))
+
+        return cls(
+            fuels=pd.Categorical(fuel_data['fuel'], categories=list(dict.fromkeys(fuel_data['fuel']))),
+            types=types,
+            years=fuel_data['year'].to_numpy(dtype=np.int16),
+            totals=np.ascontiguousarray(fuel_data[total_cols].to_numpy(dtype=np.float64).T),
+            part_names=part_names,
+            part_blocks=part_blocks,
+            columns=fuel_data.columns.to_list(),
+        )
+
+    @property
+    def fuels(self) -> list[str]:
+        return self._fuels.categories.to_list()
+
+    @property
+    def nbytes(self) -> int:
+        return (self._fuels.codes.nbytes + self._types.codes.nbytes + self._years.nbytes + self._totals.nbytes +
+                sum(arr.nbytes for block in self._part_blocks for arr in block))
+
+    def __len__(self) -> int:
+        return len(self._years)
+
+    # frame with fuel, type, year, and totals of the selected fuels and years; without selection the columns of the
+    # totals are views of the store. Unlike in the wide fuel data, fuel and type are categorical and year is int16.
+    def totals(self, fuels: Optional[list] = None, years: Optional[list] = None) -> pd.DataFrame:
+        rows = self._select(fuels, years)
+        return pd.DataFrame({
+            'fuel': self._fuels if rows is None else self._fuels[rows],
+            'type': self._types if rows is None else self._types[rows],
+            'year': self._years if rows is None else self._years[rows],
+            **{col: values if rows is None else values[rows] for col, values in zip(total_cols, self._totals)},
+        }, copy=False)
+
+    # long frame with the components and uncertainty contributions (e.g. cost__fuel or ghgi_uu__<param>) of the
+    # selected fuels and years, optionally only of one mode (cost or ghgi)
+    def parts(self, fuels: Optional[list] = None, years: Optional[list] = None,
+              mode: Optional[str] = None) -> pd.DataFrame:
+        selected = self._select(fuels, years)
+
+        part_rows, part_vars, part_values = [], [], []
+        for rows, cols, values in self._part_blocks:
+            keep_rows = np.ones(len(rows), dtype=bool) if selected is None else np.isin(rows, selected)
+            keep_cols = np.array([mode is None or self._part_names[c].split('__', 1)[0].split('_')[0] == mode
+                                  for c in cols], dtype=bool)
+            block = values[np.ix_(keep_rows, keep_cols)]
+            defined = ~np.isnan(block)
+
+            part_rows.append(np.broadcast_to(rows[keep_rows, np.newaxis], block.shape)[defined])
+            part_vars.append(np.broadcast_to(cols[keep_cols], block.shape)[defined])
+            part_values.append(block[defined])
+
+        part_rows = np.concatenate(part_rows) if part_rows else np.empty(0, dtype=np.int32)
+        return pd.DataFrame({
+            'fuel': self._fuels[part_rows],
+            'type': self._types[part_rows],
+            'year': self._years[part_rows],
+            'variable': pd.Categorical.from_codes(np.concatenate(part_vars) if part_vars else np.empty(0, dtype=int),
+                                                  categories=self._part_names),
+            'value': np.concatenate(part_values) if part_values else np.empty(0),
+        })
+
+    # wide fuel data with the same columns, order, dtypes, and values as the frame the store was built from; the frame is
+    # rebuilt on every call (it is not kept, as it takes several times the memory of the store) and owned by the caller
+    def wide(self) -> pd.DataFrame:
+        parts = np.full((len(self), len(self._part_names)), np.nan)
+        for rows, cols, values in self._part_blocks:
+            parts[np.ix_(rows, cols)] = values
+
+        cols = {
+            'fuel': np.asarray(self._fuels, dtype=object),
+            'type': np.asarray(self._types, dtype=object),
+            'year': self._years.astype(np.int64),
+            **dict(zip(total_cols, self._totals)),
+            **dict(zip(self._part_names, parts.T)),
+        }
+        return pd.DataFrame({col: cols[col] for col in self._columns}, copy=True)
+
+    # indices of rows of the selected fuels and years, or None if nothing is deselected
+    def _select(self, fuels: Optional[list], years: Optional[list]) -> Optional[np.ndarray]:
+        if fuels is None and years is None:
+            return None
+
+        mask = np.ones(len(self), dtype=bool)
+        if fuels is not None:
+            mask &= np.isin(self._fuels.codes, self._fuels.categories.get_indexer(list(fuels)))
+        if years is not None:
+            mask &= np.isin(self._years, list(years))
+
+        return np.flatnonzero(mask)
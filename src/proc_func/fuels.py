@@ -1,29 +1,42 @@
-import copy
+from typing import Optional
 
 import numpy as np
 import pandas as pd
 
+from src.cache import ResultCache
 from src.proc_func.cost import calc_cost
 from src.proc_func.ghgi import calc_ghgi
-from src.proc_func.helper import ParameterHandler
+from src.proc_func.helper import ParameterHandler, ParameterStore
 from src.proc_func.params import get_full_params
 
 
-# calculate fuel data
+# full parameters of fuel cases, keyed by their specifications
+_param_series_cache = ResultCache(maxsize=1024)
+
+
+# calculate fuel data; if the data of a previous call with the same times, parameters, GWP, and units is provided, only
+# the fuel cases whose specifications changed are recomputed
 def calc_fuel_data(times: list, full_params: pd.DataFrame, fuels: dict,
-                   params: dict, gwp: str, params_options: dict, units: dict):
-    fuel_entries = []
+                   params: dict, gwp: str, params_options: dict, units: dict, prev: Optional[dict] = None):
+    prev_fuels, prev_specs, prev_data = (prev['fuels'], prev['fuelSpecs'], prev['fuelData']) \
+        if prev is not None else ({}, {}, None)
+
     fuel_specs = {}
+    reused = []
 
     for fuel_id, fuel in fuels.items():
-        if 'cases' not in fuel:
+        # reuse all cases of fuels that did not change
+        if fuel_id in prev_fuels and fuel == prev_fuels[fuel_id]:
+            for fuel_id_full, specs in prev_specs.items():
+                if specs['type'] == fuel_id:
+                    fuel_specs[fuel_id_full] = specs
+                    reused.append(fuel_id_full)
+        elif 'cases' not in fuel:
             options = {
                 'blue_tech': fuel['blue_tech'] if 'blue_tech' in fuel else None,
                 'gwp': gwp,
             }
 
-            fuel_entries.extend(calc_fuel(full_params, fuel_id, fuel_id, options, times, params_options))
-
             fuel_specs[fuel_id] = {
                 'name': fuel['name'],
                 'type': fuel_id,
@@ -33,10 +46,17 @@ def calc_fuel_data(times: list, full_params: pd.DataFrame, fuels: dict,
                 'options': options,
             }
         else:
+            changed = _get_changed_cases(fuel, prev_fuels[fuel_id] if fuel_id in prev_fuels else None)
             cases = _get_cases(fuel['cases'], params, times, units)
             for cid, case in cases.items():
                 fuel_id_full = f"{fuel_id}-{cid}"
 
+                # reuse cases that are only composed of unchanged cases of each dimension
+                if changed is not None and not (case['parts'] & changed) and fuel_id_full in prev_specs:
+                    fuel_specs[fuel_id_full] = prev_specs[fuel_id_full]
+                    reused.append(fuel_id_full)
+                    continue
+
                 options = {
                     'blue_tech': (case['blue_tech']
                                   if 'blue_tech' in case else
@@ -46,9 +66,10 @@ def calc_fuel_data(times: list, full_params: pd.DataFrame, fuels: dict,
                     'gwp': gwp,
                 }
 
-                overridden_names = case['params'].droplevel(level=1).index.unique().to_list()
-                this_params = pd.concat([full_params.query(f"name not in @overridden_names"), case['params']])
-                fuel_entries.extend(calc_fuel(this_params, fuel_id_full, fuel_id, options, times, params_options))
+                overridden = full_params.index.get_level_values(0).isin(
+                    [name for series in case['params'] for name in series.index.get_level_values(0)]
+                )
+                this_params = pd.concat([full_params[~overridden], *(series for series in case['params'] if not series.empty)])
 
                 fuel_specs[fuel_id_full] = {
                     'name': f"{fuel['name']} ({case['desc']})",
@@ -59,27 +80,83 @@ def calc_fuel_data(times: list, full_params: pd.DataFrame, fuels: dict,
                     'options': options,
                 }
 
-    return pd.DataFrame.from_records(fuel_entries), fuel_specs
+    if not reused:
+        fuel_data = calc_fuels_batched(fuel_specs, times, params_options)
+    else:
+        recomputed = {fuel_id_full: specs for fuel_id_full, specs in fuel_specs.items() if fuel_id_full not in reused}
+        fuel_data = _merge_fuel_data(
+            fuel_specs,
+            prev_data.query('fuel in @reused'),
+            *([calc_fuels_batched(recomputed, times, params_options)] if recomputed else []),
+        )
+
+    return fuel_data, fuel_specs
+
+
+# get cases (pairs of dimension and case name) of a fuel that changed with respect to a previous version of the fuel,
+# or None if all cases have to be recomputed
+def _get_changed_cases(fuel: dict, prev_fuel: Optional[dict]):
+    if prev_fuel is None or 'cases' not in prev_fuel or list(fuel['cases']) != list(prev_fuel['cases']) or \
+            any(fuel[k] != prev_fuel.get(k) for k in fuel if k != 'cases') or \
+            any(k not in fuel for k in prev_fuel):
+        return None
+
+    return {
+        (dim, c)
+        for dim in fuel['cases']
+        for c in fuel['cases'][dim]
+        if c not in prev_fuel['cases'][dim] or fuel['cases'][dim][c] != prev_fuel['cases'][dim][c]
+    }
+
+
+# merge reused and recomputed rows of fuel data in the order of the fuel specs
+def _merge_fuel_data(fuel_specs: dict, *fuel_data_parts: pd.DataFrame):
+    order = {fuel_id_full: k for k, fuel_id_full in enumerate(fuel_specs)}
+    return pd.concat([p for p in fuel_data_parts if not p.empty], ignore_index=True) \
+        .sort_values(by='fuel', key=lambda col: col.map(order), kind='stable') \
+        .reset_index(drop=True)
+
+
+# evaluate all fuels with the same type and options in one go, stacking their parameters along a case axis
+def calc_fuels_batched(fuel_specs: dict, times: list, params_options: dict):
+    batches = {}
+    for fuel_id_full, specs in fuel_specs.items():
+        key = (specs['type'], tuple(sorted(specs['options'].items())))
+        batches.setdefault(key, []).append(fuel_id_full)
+
+    fuel_entries = [
+        calc_fuel_batch([fuel_specs[f]['params'] for f in fuel_ids], fuel_ids, fuel_type,
+                        fuel_specs[fuel_ids[0]]['options'], times, params_options)
+        for (fuel_type, _), fuel_ids in batches.items()
+    ]
+
+    # restore order of fuels as provided
+    return _merge_fuel_data(fuel_specs, *fuel_entries)
 
 
 def calc_fuel(full_params: pd.DataFrame, fuel_id_full: str, fuel_type: str,
               options: dict, times: list, params_options: dict):
-    r = []
+    return calc_fuel_batch([full_params], [fuel_id_full], fuel_type, options, times, params_options)
 
-    for t in times:
-        current_params = full_params.query(f"year=={t}").droplevel(level=1)
-        param_handler = ParameterHandler(current_params, params_options)
 
-        new_fuel = {'fuel': fuel_id_full, 'type': fuel_type, 'year': t}
+def calc_fuel_batch(params_list: list[pd.DataFrame], fuel_ids: list[str], fuel_type: str,
+                    options: dict, times: list, params_options: dict):
+    # evaluate cost and GHGI of all cases and times at once by feeding (case x year) arrays through the formulas
+    param_handler = ParameterHandler(ParameterStore(*params_list), params_options, year=list(times))
 
-        levelised_cost = calc_cost(param_handler, fuel_type, options)
-        new_fuel |= _get_components(levelised_cost, 'cost')
-        levelised_ghgi = calc_ghgi(param_handler, fuel_type, options)
-        new_fuel |= _get_components(levelised_ghgi, 'ghgi')
+    levelised_cost = calc_cost(param_handler, fuel_type, options)
+    levelised_ghgi = calc_ghgi(param_handler, fuel_type, options)
 
-        r.append(new_fuel)
-
-    return r
+    shape = (len(fuel_ids), len(times))
+    return pd.DataFrame({
+        'fuel': np.repeat(fuel_ids, len(times)),
+        'type': fuel_type,
+        'year': np.tile(times, len(fuel_ids)),
+        **{
+            col: np.broadcast_to(v, shape).ravel()
+            for col, v in (_get_components(levelised_cost, 'cost') | _get_components(levelised_ghgi, 'ghgi')).items()
+        },
+    })
 
 
 def _get_components(levelised: dict, mode: str):
@@ -104,7 +181,7 @@ def _get_components(levelised: dict, mode: str):
                 if varname not in r_unc:
                     r_unc[varname] = levelised[component][ut][pname]
                 else:
-                    r_unc[varname] += levelised[component][ut][pname]
+                    r_unc[varname] = r_unc[varname] + levelised[component][ut][pname]
 
         r_unc[f"{mode}_{ut}"] = np.sqrt(sum(c**2 for c in r_unc.values()))
 
@@ -113,8 +190,11 @@ def _get_components(levelised: dict, mode: str):
     return r
 
 
+# get all combinations of the cases of each dimension, with the parameters of each case given as list of frames of
+# expanded parameters
 def _get_cases(cases: dict, params: dict, times: list, units: dict):
     overridden = {}
+    base_key = ResultCache.key(units, times)
 
     for dim in cases:
         overridden[dim] = {}
@@ -124,14 +204,14 @@ def _get_cases(cases: dict, params: dict, times: list, units: dict):
                 'desc': cases[dim][c]['desc'],
                 'colour': cases[dim][c]['colour'] if 'colour' in cases[dim][c] else None,
                 'blue_tech': cases[dim][c]['blue_tech'] if 'blue_tech' in cases[dim][c] else None,
+                'parts': {(dim, c)},
             }
 
-            overridden_params = {p: copy.deepcopy(params[p]) for p in cases[dim][c] if p not in overridden[dim][c]}
-
-            for p in overridden_params:
-                overridden_params[p]['value'] = cases[dim][c][p]
-
-            overridden[dim][c]['params'] = get_full_params(overridden_params, units, times)
+            overridden[dim][c]['params'] = [
+                _get_param_series(p, params[p] | {'value': cases[dim][c][p]}, base_key, units, times)
+                for p in cases[dim][c]
+                if p not in overridden[dim][c]
+            ]
 
     return _merge_cases(overridden)
 
@@ -148,10 +228,22 @@ def _merge_cases(overridden: dict):
             '-'.join([c for c in [c1, c2] if not c == 'none']): {
                 'desc': f"{entry[c1]['desc']}, {r[c2]['desc']}",
                 'colour': entry[c1]['colour'] if entry[c1]['colour'] else r[c2]['colour'],
-                'params': pd.concat([entry[c1]['params'], r[c2]['params']]),
+                'params': entry[c1]['params'] + r[c2]['params'],
                 'blue_tech': (r[c2]['blue_tech']
                               if 'blue_tech' in r[c2] and r[c2]['blue_tech'] else
                               entry[c1]['blue_tech']),
+                'parts': entry[c1]['parts'] | r[c2]['parts'],
             }
             for c2 in r for c1 in entry
         }
+
+
+# expanded time series of a parameter with an overridden value; identical overrides (e.g. in cases of several fuels or
+# dimensions) are expanded once and share the same frame
+def _get_param_series(par_id: str, par: dict, base_key: str, units: dict, times: list) -> pd.DataFrame:
+    key = ResultCache.key(par_id, par, base_key)
+    series = _param_series_cache.get(key)
+    if series is None:
+        series = get_full_params({par_id: par}, units, times)
+        _param_series_cache.put(key, series)
+    return series
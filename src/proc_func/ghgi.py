@@ -4,9 +4,9 @@ from src.proc_func.helper import simple_ret_val_unc, ParameterHandler
 known_blue_techs = ['smr-ccs-56%', 'atr-ccs-93%', 'atr-ccs-93%-lowscco2']
 
 
-def calc_ghgi(param_handler: ParameterHandler, fuel_type: str, options: dict):
+def calc_ghgi(param_handler: ParameterHandler, fuel_type: str, options: dict, calc_unc: bool = True):
     p = params_ghgi(param_handler, fuel_type, options)
-    return eval_ghgi(p, fuel_type)
+    return eval_ghgi(p, fuel_type, calc_unc)
 
 
 def params_ghgi(param_handler: ParameterHandler, fuel_type: str, options: dict):
@@ -20,13 +20,13 @@ def params_ghgi(param_handler: ParameterHandler, fuel_type: str, options: dict):
         raise Exception(f"Unknown fuel type: {fuel_type}")
 
 
-def eval_ghgi(p, fuel_type: str):
+def eval_ghgi(p, fuel_type: str, calc_unc: bool = True):
     if fuel_type == 'NG':
-        return get_ghgi_ng(**p)
+        return get_ghgi_ng(**p, calc_unc=calc_unc)
     elif fuel_type == 'BLUE':
-        return get_ghgi_blue(**p)
+        return get_ghgi_blue(**p, calc_unc=calc_unc)
     elif fuel_type == 'GREEN':
-        return get_ghgi_green(**p)
+        return get_ghgi_green(**p, calc_unc=calc_unc)
     else:
         raise Exception(f"Unknown fuel: {fuel_type}")
 
@@ -0,0 +1,201 @@
+import multiprocessing
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.proc_func.cost import calc_cost
+from src.proc_func.ghgi import calc_ghgi
+from src.proc_func.helper import ParameterHandler, ParameterStore
+
+
+# model and design matrix shared with forked worker processes
+_shared: Optional[tuple] = None
+
+# deviation of Sobol indices from [0, 1] up to which it is attributed to the estimation error
+sobol_tolerance = 0.1
+
+
+# Variance-based global sensitivity indices of the FSCP from fuel y to fuel x with respect to all parameters with
+# uncertainty used by the two fuels. Every parameter is varied uniformly between val-ul and val+uu, independently of
+# the others but with the same position within this range for both fuels and all years. First-order indices use the
+# estimator of Saltelli et al. (2010) and total-order indices the one of Jansen (1999), both from a base sample of
+# n_base quasi-random points (randomly shifted Halton sequence), requiring n_base*(k+2) model evaluations for k
+# parameters. Indices within sobol_tolerance of [0, 1] are clipped to [0, 1]. Indices further outside this range mean
+# that the variance of the FSCP is not finite (its GHGI difference can vanish within the parameter space), so all
+# indices of these years are masked (NaN) with a warning.
+def calc_sobol_indices(fuel_specs: dict, fuel_x: str, fuel_y: str, times: list, params_options: dict,
+                       n_base: int = 1024, chunk_size: int = 20_000, seed: Optional[int] = None,
+                       max_workers: Optional[int] = None) -> pd.DataFrame:
+    model = _FSCPModel(fuel_specs, fuel_x, fuel_y, times, params_options)
+    k = len(model.factors)
+    rng = np.random.default_rng(seed)
+
+    # base matrices A and B and matrices AB_i with column i taken from B
+    sample = _get_halton_sequence(n_base, 2 * k, rng)
+    a, b = sample[:, :k], sample[:, k:]
+    ab = np.repeat(a[np.newaxis], k, axis=0)
+    ab[np.arange(k), :, np.arange(k)] = b.T
+
+    f = _evaluate(model, np.concatenate([a, b, ab.reshape(-1, k)]), chunk_size, max_workers)
+    f_a, f_b, f_ab = f[:n_base], f[n_base:2 * n_base], f[2 * n_base:].reshape(k, n_base, -1)
+
+    var = np.var(np.concatenate([f_a, f_b]), axis=0)
+    s1 = np.mean(f_b * (f_ab - f_a), axis=1) / var
+    st = 0.5 * np.mean((f_a - f_ab) ** 2, axis=1) / var
+
+    invalid = np.zeros(len(model.times), dtype=bool)
+    for indices in [s1, st]:
+        with np.errstate(invalid='ignore'):
+            invalid |= (~np.isfinite(indices) | (indices < -sobol_tolerance) |
+                        (indices > 1.0 + sobol_tolerance)).any(axis=0)
+    if invalid.any():
+        warnings.warn(f"Sobol indices of the FSCP from {fuel_y} to {fuel_x} are not defined in years "
+                      f"{', '.join(str(t) for t, i in zip(model.times, invalid) if i)}, as the variance of the FSCP is "
+                      f"not finite. These indices are masked.")
+    s1, st = (np.where(invalid, np.nan, np.clip(indices, 0.0, 1.0)) for indices in [s1, st])
+
+    return _get_table(model, {'S1': s1, 'ST': st})
+
+
+# Elementary effects (Morris screening) of the FSCP from fuel y to fuel x with respect to all parameters with
+# uncertainty used by the two fuels, on the same parameter space as calc_sobol_indices. Uses n_trajectories random
+# one-at-a-time trajectories on a grid with n_levels levels, requiring n_trajectories*(k+1) model evaluations.
+def calc_morris_indices(fuel_specs: dict, fuel_x: str, fuel_y: str, times: list, params_options: dict,
+                        n_trajectories: int = 100, n_levels: int = 4, chunk_size: int = 20_000,
+                        seed: Optional[int] = None, max_workers: Optional[int] = None) -> pd.DataFrame:
+    model = _FSCPModel(fuel_specs, fuel_x, fuel_y, times, params_options)
+    k = len(model.factors)
+    rng = np.random.default_rng(seed)
+    delta = n_levels / (2 * (n_levels - 1))
+
+    # random start points on the grid (such that a step of +delta stays within the unit cube), random order of the
+    # parameters, and random step directions
+    start = rng.integers(0, n_levels // 2, size=(n_trajectories, k)) / (n_levels - 1)
+    order = np.argsort(rng.random((n_trajectories, k)), axis=1)
+    direction = rng.choice([-1.0, 1.0], size=(n_trajectories, k))
+    start = np.where(direction < 0, start + delta, start)
+
+    steps = np.zeros((n_trajectories, k + 1, k))
+    rows = np.arange(n_trajectories)
+    for s in range(k):
+        steps[:, s + 1] = steps[:, s]
+        steps[rows, s + 1, order[:, s]] = direction[rows, order[:, s]] * delta
+    points = start[:, np.newaxis, :] + steps
+
+    f = _evaluate(model, points.reshape(-1, k), chunk_size, max_workers).reshape(n_trajectories, k + 1, -1)
+
+    # elementary effects sorted by parameter
+    effects = np.empty((n_trajectories, k, f.shape[-1]))
+    effects[rows[:, np.newaxis], order] = (f[:, 1:] - f[:, :-1]) / (direction[rows[:, np.newaxis], order] *
+                                                                     delta)[..., np.newaxis]
+
+    return _get_table(model, {
+        'mu': effects.mean(axis=0),
+        'mu_star': np.abs(effects).mean(axis=0),
+        'sigma': effects.std(axis=0, ddof=1),
+    })
+
+
+# FSCP from fuel y to fuel x as a function of points in the unit cube (one coordinate per parameter with uncertainty)
+class _FSCPModel:
+    def __init__(self, fuel_specs: dict, fuel_x: str, fuel_y: str, times: list, params_options: dict):
+        self._fuels = [(fuel_specs[f]['type'], fuel_specs[f]['options']) for f in [fuel_x, fuel_y]]
+        self._stores = [ParameterStore(fuel_specs[f]['params']) for f in [fuel_x, fuel_y]]
+        self._times = list(times)
+        self._params_options = params_options
+
+        # find the parameters with uncertainty by recording the offsets the formulas look up
+        recorder = _Recorder()
+        self._eval(recorder, 2)
+        self.factors: list[str] = list(recorder)
+
+    @property
+    def times(self) -> list:
+        return self._times
+
+    def __call__(self, u: np.ndarray) -> np.ndarray:
+        return self._eval({name: u[:, i] for i, name in enumerate(self.factors)}, len(u))
+
+    def _eval(self, offsets, n: int) -> np.ndarray:
+        totals = []
+        for (fuel_type, options), store in zip(self._fuels, self._stores):
+            param_handler = ParameterHandler(store.perturbed(offsets, n, uniform=True), self._params_options,
+                                             year=self._times)
+            totals.append([
+                np.broadcast_to(sum(c['val'] for c in calc(param_handler, fuel_type, options, calc_unc=False).values()),
+                                (n, len(self._times)))
+                for calc in [calc_cost, calc_ghgi]
+            ])
+        (cost_x, ghgi_x), (cost_y, ghgi_y) = totals
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (cost_x - cost_y) / (ghgi_y - ghgi_x)
+
+
+class _Recorder(dict):
+    def __missing__(self, pname: str):
+        self[pname] = np.zeros(2)
+        return self[pname]
+
+
+# evaluate model on all rows of a design matrix in chunks, in parallel in forked worker processes where possible
+def _evaluate(model: _FSCPModel, u: np.ndarray, chunk_size: int, max_workers: Optional[int]) -> np.ndarray:
+    chunks = [(i, min(i + chunk_size, len(u))) for i in range(0, len(u), chunk_size)]
+    max_workers = min(len(chunks), max_workers or os.cpu_count() or 1)
+
+    if max_workers < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+        return np.concatenate([model(u[i:j]) for i, j in chunks])
+
+    global _shared
+    _shared = (model, u)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('fork')) as pool:
+            return np.concatenate(list(pool.map(_evaluate_chunk, chunks)))
+    finally:
+        _shared = None
+
+
+def _evaluate_chunk(chunk: tuple) -> np.ndarray:
+    model, u = _shared
+    i, j = chunk
+    return model(u[i:j])
+
+
+# Halton sequence in d dimensions with a random shift modulo one
+def _get_halton_sequence(n: int, d: int, rng: np.random.Generator) -> np.ndarray:
+    ret = np.empty((n, d))
+    for j, base in enumerate(_get_primes(d)):
+        i = np.arange(1, n + 1)
+        f = 1.0
+        r = np.zeros(n)
+        while (i > 0).any():
+            f /= base
+            r += f * (i % base)
+            i //= base
+        ret[:, j] = r
+
+    return (ret + rng.random(d)) % 1.0
+
+
+def _get_primes(n: int) -> list[int]:
+    primes = []
+    candidate = 2
+    while len(primes) < n:
+        if all(candidate % p for p in primes if p * p <= candidate):
+            primes.append(candidate)
+        candidate += 1
+    return primes
+
+
+# tidy table of indices given as arrays of shape (param x year)
+def _get_table(model: _FSCPModel, indices: dict) -> pd.DataFrame:
+    k, n_years = len(model.factors), len(model.times)
+    return pd.DataFrame({
+        'year': np.tile(model.times, k),
+        'param': np.repeat(model.factors, n_years),
+        **{name: np.asarray(values).ravel() for name, values in indices.items()},
+    })
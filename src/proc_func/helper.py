@@ -1,27 +1,154 @@
+from typing import Mapping, Optional, Union
+
+import numpy as np
 import pandas as pd
 
 
+# Compiled store of one or several parameter dataframes (indexed by name and year). Every full parameter name is
+# resolved to an integer slot once, and values are kept in a contiguous array of shape (val/uu/ul, slot, case, year).
+class ParameterStore:
+    def __init__(self, *pars: pd.DataFrame):
+        names = pars[0].index.get_level_values(0).append([p.index.get_level_values(0) for p in pars[1:]]).unique()
+        years = pars[0].index.get_level_values(1).append([p.index.get_level_values(1) for p in pars[1:]]).unique() \
+            .sort_values()
+
+        self._names: pd.Index = names
+        self._years: pd.Index = years
+        self._slots: dict = {name: slot for slot, name in enumerate(names)}
+        self._resolved: dict = {}
+
+        self._data: np.ndarray = np.full((3, len(names), len(pars), len(years)), np.nan)
+        for case, p in enumerate(pars):
+            slots = names.get_indexer(p.index.get_level_values(0))
+            cols = years.get_indexer(p.index.get_level_values(1))
+            self._data[:, slots, case, cols] = p[['val', 'uu', 'ul']].to_numpy(dtype=float).T
+        self._data.flags.writeable = False
+
+    @property
+    def years(self) -> pd.Index:
+        return self._years
+
+    @property
+    def n_cases(self) -> int:
+        return self._data.shape[2]
+
+    def year_index(self, year):
+        if np.ndim(year):
+            idx = self._years.get_indexer(year)
+            if (idx < 0).any():
+                raise KeyError(f"Years not found in parameters: {list(np.asarray(year)[idx < 0])}")
+            return idx
+        return self._years.get_loc(year)
+
+    # resolve parameter name and option values to a slot, joining the full name only on the first request
+    def resolve(self, pname: str, option_values: tuple) -> int:
+        key = (pname, option_values)
+        if key not in self._resolved:
+            self._resolved[key] = self._slots['_'.join((pname,) + option_values)]
+        return self._resolved[key]
+
+    def get(self, slot: int, case_sel, year_sel) -> np.ndarray:
+        return self._data[:, slot][:, case_sel, year_sel]
+
+    def name(self, slot: int) -> str:
+        return self._names[slot]
+
+    def perturbed(self, offsets: Mapping, n_samples: int, bounds: Optional[Mapping] = None,
+                  uniform: bool = False) -> 'PerturbedParameterStore':
+        return PerturbedParameterStore(self, offsets, n_samples, bounds, uniform)
+
+
+# View of a parameter store with a single case, where every parameter with uncertainty is shifted by an offset per
+# sample given in units of its upper (positive offsets) or lower (negative offsets) uncertainty. The samples form the
+# case axis. Offsets are looked up by full parameter name, so the same draws are shared across stores. Alternatively
+# (uniform), offsets within [0, 1] are mapped linearly onto [val-ul, val+uu]. Optionally, the shifted values are clipped
+# to bounds (lower, upper) given per full parameter name.
+class PerturbedParameterStore:
+    def __init__(self, base: ParameterStore, offsets: Mapping, n_samples: int, bounds: Optional[Mapping] = None,
+                 uniform: bool = False):
+        if base.n_cases != 1:
+            raise Exception('Only parameter stores with a single case can be perturbed.')
+
+        self._base: ParameterStore = base
+        self._offsets: Mapping = offsets
+        self._n_samples: int = n_samples
+        self._bounds: Mapping = bounds or {}
+        self._uniform: bool = uniform
+
+    @property
+    def years(self) -> pd.Index:
+        return self._base.years
+
+    @property
+    def n_cases(self) -> int:
+        return self._n_samples
+
+    def year_index(self, year):
+        return self._base.year_index(year)
+
+    def resolve(self, pname: str, option_values: tuple) -> int:
+        return self._base.resolve(pname, option_values)
+
+    # parameters without uncertainty are returned without sample axis and broadcast in the formulas
+    def get(self, slot: int, case_sel, year_sel) -> tuple:
+        val, uu, ul = self._base.get(slot, 0, year_sel)
+        if np.isnan(uu).all() and np.isnan(ul).all():
+            return val, uu, ul
+
+        name = self._base.name(slot)
+        z = self._offsets[name][case_sel]
+        v, v_uu, v_ul = val, np.nan_to_num(uu), np.nan_to_num(ul)
+
+        # values that are the same in all years are shifted once per sample and broadcast in the formulas
+        if np.ndim(v) and np.ndim(z):
+            if (v == v.flat[0]).all() and (v_uu == v_uu.flat[0]).all() and (v_ul == v_ul.flat[0]).all():
+                v, v_uu, v_ul = v.flat[0], v_uu.flat[0], v_ul.flat[0]
+            z = z[:, np.newaxis]
+
+        if self._uniform:
+            shifted = (v_ul + v_uu) * z + (v - v_ul)
+        else:
+            shifted = (np.where(z > 0.0, v_uu, v_ul) * z if np.any(v_uu != v_ul) else v_uu * z) + v
+        if name in self._bounds:
+            shifted = np.clip(shifted, *self._bounds[name])
+        return shifted, uu, ul
+
+
 class ParameterHandler:
-    def __init__(self, pars: pd.DataFrame, params_options: dict):
-        self._pars: pd.DataFrame = pars
+    def __init__(self, pars: Union[pd.DataFrame, ParameterStore, PerturbedParameterStore], params_options: dict,
+                 year: Optional[Union[int, list]] = None):
+        # single-year dataframe indexed by parameter name only
+        if isinstance(pars, pd.DataFrame):
+            pars = ParameterStore(pars.assign(year=0).set_index('year', append=True))
+            year = 0
+
+        self._store: Union[ParameterStore, PerturbedParameterStore] = pars
         self._params_options: dict = params_options
 
+        # select a single case and year (returning scalars) or several of them (returning arrays)
+        self._case_sel = 0 if pars.n_cases == 1 else slice(None)
+        self._year_sel = pars.year_index(year) if year is not None else slice(None)
+
     def get_val_and_unc(self, pname: str, options: dict):
-        pname_full = self._get_full_pname(pname, options)
-        r = self._pars.loc[pname_full, ['val', 'uu', 'ul']]
-        if pd.isna(r['uu']) or pd.isna(r['ul']):
-            raise Exception(f"Trying to access the uncertainty of parameter {pname} with no uncertainty provided:\n{r}")
-        return tuple(r)
+        val, uu, ul = self._get(pname, options)
+        if np.isnan(uu).any() or np.isnan(ul).any():
+            raise Exception(f"Trying to access the uncertainty of parameter {pname} with no uncertainty provided:\n"
+                            f"val={val}, uu={uu}, ul={ul}")
+        return val, uu, ul
 
     def get_val(self, pname: str, options: dict):
-        pname_full = self._get_full_pname(pname, options)
-        r = self._pars.loc[pname_full, ['val', 'uu', 'ul']]
-        if not pd.isna(r['uu']) or not pd.isna(r['ul']):
-            raise Exception(f"Uncertainty of parameter '{pname}' provided but not used in calculation:\n{r}")
-        return r.val
-
-    def _get_full_pname(self, pname: str, options: dict):
-        return '_'.join([pname] + [options[t] for t in self._params_options[pname]])
+        val, uu, ul = self._get(pname, options)
+        if not np.isnan(uu).all() or not np.isnan(ul).all():
+            raise Exception(f"Uncertainty of parameter '{pname}' provided but not used in calculation:\n"
+                            f"val={val}, uu={uu}, ul={ul}")
+        return val
+
+    def _get(self, pname: str, options: dict):
+        slot = self._store.resolve(pname, tuple(options[t] for t in self._params_options[pname]))
+        val, uu, ul = self._store.get(slot, self._case_sel, self._year_sel)
+        if np.isnan(val).any():
+            raise Exception(f"Parameter '{pname}' not provided for all cases and years.")
+        return val, uu, ul
 
 
 def simple_ret_val_unc(val, uu, ul, pname: str, calc_unc: bool):
@@ -0,0 +1,292 @@
+import multiprocessing
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.proc_func.cost import calc_cost
+from src.proc_func.fscps import fuel_type_codes
+from src.proc_func.ghgi import calc_ghgi
+from src.proc_func.helper import ParameterHandler, ParameterStore
+
+
+# model, histograms, and chunks shared with forked worker processes
+_shared: Optional[tuple] = None
+
+
+# Monte-Carlo uncertainty of cost, GHGI, and FSCPs. Each parameter with uncertainty is drawn from a split normal
+# distribution with standard deviations uu (above val) and ul (below val), clipped to physical bounds (see _get_bounds).
+# The same draw of a parameter is used across all years and fuels, so shared parameters remain correlated. Samples are
+# evaluated in chunks of bounded size and counted into streaming histograms (see _Histogram), from which percentiles are
+# estimated, so memory depends on chunk_size and n_bins but not on n_samples. The first chunk sets the bins, and the
+# remaining chunks are evaluated in forked worker processes where possible. Every chunk has its own random stream, so
+# results do not depend on the number of workers. Optionally, the computation can be restricted to a selection of fuels
+# (and the FSCPs between them).
+def calc_mc_uncertainty(fuel_specs: dict, times: list, params_options: dict, n_samples: int = 100_000,
+                        chunk_size: int = 20_000, percentiles: tuple = (5.0, 50.0, 95.0),
+                        seed: Optional[int] = None, fuels: Optional[list] = None, n_bins: int = 16384,
+                        max_workers: Optional[int] = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    if fuels is not None:
+        fuel_specs = {fuel_id: fuel_specs[fuel_id] for fuel_id in fuels}
+
+    model = _MCModel(fuel_specs, times, params_options)
+    sizes = _get_chunks(n_samples, chunk_size)
+    chunks = list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+    hists = {key: _Histogram(n_bins) for key in model.keys}
+
+    model.add_chunk(hists, *chunks[0])
+    _add_chunks(model, hists, chunks[1:], max_workers)
+
+    pct_fuels = {
+        fuel_id: {mode: hists[fuel_id, mode].percentiles(percentiles) for mode in ['cost', 'ghgi']}
+        for fuel_id in fuel_specs
+    }
+    pct_pairs = {pair: hists[pair].percentiles(percentiles) for pair in model.pairs}
+
+    fuel_mc = pd.concat([
+        pd.DataFrame({
+            'fuel': fuel_id,
+            'type': fuel_specs[fuel_id]['type'],
+            'year': list(times),
+            **{
+                f"{mode}_p{p:g}": pct[mode][k]
+                for mode in ['cost', 'ghgi'] for k, p in enumerate(percentiles)
+            },
+        })
+        for fuel_id, pct in pct_fuels.items()
+    ], ignore_index=True)
+
+    fscp_mc = pd.concat([
+        pd.DataFrame({
+            'year': list(times),
+            'fuel_x': fuel_x,
+            'type_x': fuel_specs[fuel_x]['type'],
+            'fuel_y': fuel_y,
+            'type_y': fuel_specs[fuel_y]['type'],
+            **{f"fscp_p{p:g}": pct[k] for k, p in enumerate(percentiles)},
+        })
+        for (fuel_x, fuel_y), pct in pct_pairs.items()
+    ], ignore_index=True).sort_values(by=['fuel_x', 'fuel_y', 'year']).reset_index(drop=True)
+
+    return fuel_mc, fscp_mc
+
+
+# cost and GHGI of fuels and FSCPs between them evaluated on samples of the parameters
+class _MCModel:
+    def __init__(self, fuel_specs: dict, times: list, params_options: dict):
+        self._fuel_specs = fuel_specs
+        self._times = list(times)
+        self._params_options = params_options
+        self._stores = {fuel_id: ParameterStore(specs['params']) for fuel_id, specs in fuel_specs.items()}
+        self._bounds = {fuel_id: _get_bounds(specs['params']) for fuel_id, specs in fuel_specs.items()}
+
+        self.pairs: list[tuple[str, str]] = [
+            (fuel_x, fuel_y)
+            for fuel_x in fuel_specs for fuel_y in fuel_specs
+            if fuel_type_codes[fuel_specs[fuel_y]['type']] < fuel_type_codes[fuel_specs[fuel_x]['type']]
+        ]
+
+        # histogram keys: (fuel, mode) for cost and GHGI, and pairs of fuels for FSCPs
+        self.keys: list[tuple[str, str]] = [(fuel_id, mode) for fuel_id in fuel_specs for mode in ['cost', 'ghgi']] + \
+            self.pairs
+
+    # evaluate a chunk of n samples and add it to the histograms
+    def add_chunk(self, hists: dict, n: int, seed: np.random.SeedSequence):
+        draws = _Draws(np.random.default_rng(seed), n)
+        shape = (n, len(self._times))
+
+        # evaluate cost and GHGI of all fuels on (sample x year) arrays
+        totals = {}
+        for fuel_id, specs in self._fuel_specs.items():
+            param_handler = ParameterHandler(self._stores[fuel_id].perturbed(draws, n, self._bounds[fuel_id]),
+                                             self._params_options, year=self._times)
+            totals[fuel_id] = {
+                'cost': _get_total(calc_cost(param_handler, specs['type'], specs['options'], calc_unc=False), shape),
+                'ghgi': _get_total(calc_ghgi(param_handler, specs['type'], specs['options'], calc_unc=False), shape),
+            }
+
+            for mode in ['cost', 'ghgi']:
+                hists[fuel_id, mode].add(totals[fuel_id][mode])
+
+        # compute FSCPs from sampled cost and GHGI
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for fuel_x, fuel_y in self.pairs:
+                hists[fuel_x, fuel_y].add((totals[fuel_x]['cost'] - totals[fuel_y]['cost']) /
+                                          (totals[fuel_y]['ghgi'] - totals[fuel_x]['ghgi']))
+
+
+# add chunks to the histograms, in parallel in forked worker processes where possible, with every worker counting its
+# share of the chunks into empty histograms with the same bins, which are merged in the parent
+def _add_chunks(model: _MCModel, hists: dict, chunks: list, max_workers: Optional[int]):
+    max_workers = min(len(chunks), max_workers or os.cpu_count() or 1)
+    if max_workers < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+        for n, seed in chunks:
+            model.add_chunk(hists, n, seed)
+        return
+
+    blocks = [chunks[k::max_workers] for k in range(max_workers)]
+
+    global _shared
+    _shared = (model, hists)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('fork')) as pool:
+            for counted in pool.map(_count_block, blocks):
+                for key, hist in counted.items():
+                    hists[key].merge(hist)
+    finally:
+        _shared = None
+
+
+def _count_block(block: list) -> dict:
+    model, hists = _shared
+    counted = {key: hist.empty_like() for key, hist in hists.items()}
+    for n, seed in block:
+        model.add_chunk(counted, n, seed)
+    return counted
+
+
+# standard normal draws per full parameter name, drawn on first request
+class _Draws(dict):
+    def __init__(self, rng: np.random.Generator, n: int):
+        super().__init__()
+        self._rng: np.random.Generator = rng
+        self._n: int = n
+
+    def __missing__(self, pname: str):
+        self[pname] = self._rng.standard_normal(self._n)
+        return self[pname]
+
+
+# Streaming histogram of (sample x year) arrays added chunk by chunk, with one row of counts per year. Values are binned
+# on the scale asinh((x - centre) / scale), with centre and scale (median and half the interquartile range) taken from
+# the first chunk, which is linear around the centre and logarithmic in the tails, so heavy tails (e.g. of FSCPs close
+# to a vanishing GHGI difference) are covered by few bins without losing resolution in the centre. The range of the
+# n_bins regular bins is set from the first chunk, widened by half its span on either side. Values outside of it are
+# counted in an underflow and an overflow bin, which extend to the running minimum and maximum of all values, and NaN
+# values are ignored. Percentiles are interpolated linearly within bins.
+class _Histogram:
+    def __init__(self, n_bins: int):
+        self._n_bins: int = n_bins
+        self._counts: Optional[np.ndarray] = None
+        self._centre: Optional[np.ndarray] = None
+        self._scale: Optional[np.ndarray] = None
+        self._lo: Optional[np.ndarray] = None
+        self._width: Optional[np.ndarray] = None
+        self._min: Optional[np.ndarray] = None
+        self._max: Optional[np.ndarray] = None
+
+    def add(self, values: np.ndarray):
+        n_years = values.shape[1]
+        if self._counts is None:
+            self._init_bins(values)
+
+        # bin 0 is the underflow and bin n_bins+1 the overflow bin, offset by the row of the year; bins are computed in
+        # single precision, which is far finer than the bins
+        with np.errstate(invalid='ignore', over='ignore'):
+            bins = np.empty(values.shape, dtype=np.float32)
+            np.subtract(values, self._centre, out=bins, casting='same_kind')
+            bins /= self._scale.astype(np.float32)
+            np.arcsinh(bins, out=bins)
+            bins -= self._lo.astype(np.float32)
+            bins /= self._width.astype(np.float32)
+            np.floor(bins, out=bins)
+            np.clip(bins, -1.0, self._n_bins, out=bins)
+            bins += (1.0 + np.arange(n_years) * (self._n_bins + 2)).astype(np.float32)
+        nan = np.isnan(bins)
+        bins = (bins[~nan] if nan.any() else bins).astype(np.int64)
+        counts = np.bincount(bins.ravel(), minlength=self._counts.size).reshape(self._counts.shape)
+        self._counts += counts
+
+        # the underflow and overflow bins extend to the minimum and maximum of all values
+        if counts[:, 0].any():
+            self._min = np.fmin(self._min, np.fmin.reduce(values, axis=0))
+        if counts[:, -1].any():
+            self._max = np.fmax(self._max, np.fmax.reduce(values, axis=0))
+
+    # centre, scale, and range of bins from the first chunk
+    def _init_bins(self, values: np.ndarray):
+        finite = np.where(np.isfinite(values), values, np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            q1, centre, q3 = np.nanpercentile(finite, [25.0, 50.0, 75.0], axis=0)
+        centre = np.nan_to_num(centre)
+        scale = np.nan_to_num(0.5 * (q3 - q1))
+        self._centre = centre
+        self._scale = np.where(scale > 0.0, scale, np.fmax(np.abs(centre), 1.0) * 1e-6)
+
+        t = self._transform(finite)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            lo, hi = np.nanmin(t, axis=0), np.nanmax(t, axis=0)
+        lo, hi = np.nan_to_num(lo, nan=-1.0), np.nan_to_num(hi, nan=1.0)
+        span = np.where(hi > lo, hi - lo, 1.0)
+
+        self._counts = np.zeros((values.shape[1], self._n_bins + 2), dtype=np.int64)
+        self._lo = lo - 0.5 * span
+        self._width = 2.0 * span / self._n_bins
+        self._min = self._centre + self._scale * np.sinh(self._lo)
+        self._max = self._centre + self._scale * np.sinh(self._lo + self._n_bins * self._width)
+
+    # histogram with the same bins and no counts
+    def empty_like(self) -> '_Histogram':
+        ret = _Histogram(self._n_bins)
+        ret._counts = np.zeros_like(self._counts)
+        ret._centre, ret._scale, ret._lo, ret._width = self._centre, self._scale, self._lo, self._width
+        ret._min, ret._max = self._min, self._max
+        return ret
+
+    # add the counts of a histogram with the same bins
+    def merge(self, other: '_Histogram'):
+        self._counts += other._counts
+        self._min, self._max = np.fmin(self._min, other._min), np.fmax(self._max, other._max)
+
+    def percentiles(self, percentiles: tuple) -> np.ndarray:
+        ret = np.full((len(percentiles), len(self._counts)), np.nan)
+        for y, counts in enumerate(self._counts):
+            total = counts.sum()
+            if not total:
+                continue
+
+            # edges of all bins on the original scale
+            inner = self._centre[y] + self._scale[y] * np.sinh(self._lo[y] + self._width[y] *
+                                                               np.arange(self._n_bins + 1))
+            left = np.concatenate([[self._min[y]], inner])
+            right = np.concatenate([inner, [self._max[y]]])
+
+            cum = np.cumsum(counts)
+            target = np.asarray(percentiles) / 100.0 * total
+            b = np.minimum(np.searchsorted(cum, target, side='left'), len(counts) - 1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                frac = np.clip(np.where(counts[b] > 0, (target - (cum[b] - counts[b])) / counts[b], 0.0), 0.0, 1.0)
+            ret[:, y] = left[b] + frac * (right[b] - left[b])
+
+        return ret
+
+    def _transform(self, values: np.ndarray) -> np.ndarray:
+        ret = values - self._centre
+        ret /= self._scale
+        return np.arcsinh(ret, out=ret)
+
+
+# Physical bounds of the sampled values of parameters: dimensionless fractions (e.g. capture rates, efficiencies, and
+# interest rates) lie within [0, 1], and all other parameters keep the sign of their value (e.g. prices, leakage rates,
+# and emission factors stay non-negative).
+def _get_bounds(params: pd.DataFrame) -> dict[str, tuple[float, float]]:
+    bounds = {}
+    for pname, p in params.groupby(level=0):
+        if (p['val'] >= 0.0).all():
+            bounds[pname] = (0.0, 1.0 if (p['unit'].astype(str) == '1').all() else np.inf)
+        elif (p['val'] <= 0.0).all():
+            bounds[pname] = (-np.inf, 0.0)
+    return bounds
+
+
+def _get_chunks(n_samples: int, chunk_size: int):
+    return [min(chunk_size, n_samples - i) for i in range(0, n_samples, chunk_size)]
+
+
+def _get_total(levelised: dict, shape: tuple):
+    return np.broadcast_to(sum(levelised[component]['val'] for component in levelised), shape)
@@ -1,94 +1,154 @@
 import re
+from functools import lru_cache
 from typing import Union
 
+import numpy as np
 import pandas as pd
 
+from src.cache import ResultCache
+
+
+# tables for converting units (see get_unit_table), keyed by the contents of the units dict
+_unit_tables: ResultCache = ResultCache(maxsize=8)
 
-# Calculate parameters including uncertainty at different times, using linear interpolation if needed.
-def get_full_params(basic_data: dict, units: dict, times: list):
-    pars = []
 
+# Calculate parameters including uncertainty at different times, using linear interpolation if needed. The support
+# points of all parameters are collected first and then interpolated onto all times at once.
+def get_full_params(basic_data: dict, units: dict, times: list):
+    leaves = []
+    points = []
     for par_id, par in basic_data.items():
         if par['value'] == 'cases':
             continue
 
-        new_pars = _calc_values(par_id, par['type'], par['value'], times)
-        for new_par in new_pars:
-            # set relative uncertainty if not provided explicitly
-            if new_par['unc_upper'] is None or new_par['unc_lower'] is None:
-                if 'uncertainty' in par and par['uncertainty']:
-                    if isinstance(par['uncertainty'], float):
-                        unc_rel = par['uncertainty']
-                    elif isinstance(par['uncertainty'], str) and re.match(r'([0-9]*\.?[0-9]*)\s*%', par['uncertainty']):
-                        unc_rel = float(par['uncertainty'].rstrip('%'))/100.0
-                    else:
-                        raise Exception(f"Unknown relative uncertainty format: {par['uncertainty']}")
-                    new_par['unc_upper'] = unc_rel * new_par['value']
-                    new_par['unc_lower'] = unc_rel * new_par['value']
-
-            # convert unit
-            if 'unit' in par and par['unit'] is not None:
-                conversion_factor, new_unit = convert_unit(par['unit'], units)
-
-                new_par['value'] = conversion_factor * new_par['value']
-                new_par['unc_upper'] = (conversion_factor * new_par['unc_upper']
-                                        if new_par['unc_upper'] is not None else
-                                        None)
-                new_par['unc_lower'] = (conversion_factor * new_par['unc_lower']
-                                        if new_par['unc_lower'] is not None else
-                                        None)
-
-                new_par['unit'] = new_unit
-
-            pars.append(new_par)
-
-    r = pd.DataFrame.from_records(pars, columns=['name', 'year', 'unit', 'value', 'unc_upper', 'unc_lower'])\
-                    .set_index(['name', 'year'])\
-                    .rename(columns={'value': 'val', 'unc_upper': 'uu', 'unc_lower': 'ul'})
+        for name, leaf_points in _collect_points(par_id, par['type'], par['value']):
+            leaves.append((name, par))
+            points.append(leaf_points)
+
+    if not leaves:
+        return pd.DataFrame(columns=['unit', 'val', 'uu', 'ul'],
+                            index=pd.MultiIndex.from_arrays([[], []], names=['name', 'year']))
+
+    times_arr = np.asarray(times, dtype=float)
+    val, uu, ul = _interpolate(points, times_arr)
+
+    # set relative uncertainty if not provided explicitly
+    missing = np.isnan(uu) | np.isnan(ul)
+    unc_rel = np.array([
+        _get_relative_uncertainty(par['uncertainty'])
+        if missing[i].any() and 'uncertainty' in par and par['uncertainty'] else
+        np.nan
+        for i, (_, par) in enumerate(leaves)
+    ])[:, np.newaxis]
+    set_rel = missing & ~np.isnan(unc_rel)
+    uu = np.where(set_rel, unc_rel * val, uu)
+    ul = np.where(set_rel, unc_rel * val, ul)
+
+    # convert units
+    conversions = [
+        convert_unit(par['unit'], units) if 'unit' in par and par['unit'] is not None else (None, np.nan)
+        for _, par in leaves
+    ]
+    factors = np.array([1.0 if factor is None else factor for factor, _ in conversions])[:, np.newaxis]
+    val, uu, ul = factors * val, factors * uu, factors * ul
+
+    n_times = len(times_arr)
+    r = pd.DataFrame({
+        'unit': np.repeat(np.array([new_unit for _, new_unit in conversions], dtype=object), n_times),
+        'val': val.ravel(),
+        'uu': uu.ravel(),
+        'ul': ul.ravel(),
+    }, index=pd.MultiIndex.from_arrays([
+        np.repeat(np.array([name for name, _ in leaves], dtype=object), n_times),
+        np.tile(np.asarray(times), len(leaves)),
+    ], names=['name', 'year']))
 
     return r
 
 
-# Iteratively calculate values for 1) keys (smr/atr, gwp100/gwp20, etc) and 2) different times (2025, 2030, 2035, etc).
-def _calc_values(par_id: str, par_type: str, value: Union[dict, str, float], times: list):
-    rs = []
-
+# Iteratively collect the support points (year, value, upper and lower uncertainty) for all keys (smr/atr, gwp100/gwp20,
+# etc). Constant values have a single support point without year.
+def _collect_points(par_id: str, par_type: str, value: Union[dict, str, float]):
     if isinstance(value, dict) and isinstance(list(value.keys())[0], str) and '+' not in list(value.keys())[0]:
+        rs = []
         for key, val in value.items():
-            rs.extend(_calc_values(par_id + '_' + key, par_type, val, times))
+            rs.extend(_collect_points(par_id + '_' + key, par_type, val))
         return rs
 
     if par_type == 'const' or isinstance(value, float) or isinstance(value, int) or isinstance(value, str):
         if not (isinstance(value, float) or isinstance(value, int) or isinstance(value, str)):
             raise Exception('Unknown type of value variable. Must be string (including uncertainty) or float.')
 
-        value, unc_upper, unc_lower = _convert_value(value)
-
-        for t in times:
-            r = {'name': par_id, 'year': t, 'value': value, 'unc_upper': unc_upper, 'unc_lower': unc_lower}
-            rs.append(r)
+        return [(par_id, [(np.nan, *_convert_value(value))])]
 
     elif par_type == 'linear' and isinstance(value, dict):
         if not all(isinstance(v, float) or isinstance(v, int) or isinstance(v, str) for v in value.values()):
             raise Exception('Unknown type of value variable. Must be string (including uncertainty) or float.')
 
-        points = []
-        for key, val in value.items():
-            value, unc_upper, unc_lower = _convert_value(val)
-            points.append((key, value, unc_upper, unc_lower))
-
-        for t in times:
-            value, unc_upper, unc_lower = _linear_interpolate(t, points)
-            r = {'name': par_id, 'year': t, 'value': value, 'unc_upper': unc_upper, 'unc_lower': unc_lower}
-            rs.append(r)
+        return [(par_id, [(key, *_convert_value(val)) for key, val in value.items()])]
 
     else:
         raise Exception(f"Unknown data type {format(par_type)}.")
 
-    return rs
+
+# Interpolate the support points of all parameters onto times, returning arrays of value, upper and lower uncertainty
+# of shape (parameter x time) with missing uncertainties as NaN. Values provided for a time are selected directly,
+# other times are linearly interpolated from adjacent points and kept constant beyond the first and last point.
+def _interpolate(points: list, times: np.ndarray):
+    n_points = np.array([len(p) for p in points])
+    start = np.concatenate([[0], np.cumsum(n_points)[:-1]]).astype(int)
+    end = start + n_points
+
+    # support points sorted by parameter and year
+    leaf = np.repeat(np.arange(len(points)), n_points)
+    flat = np.array([
+        [np.nan if x is None else x for x in point]
+        for leaf_points in points
+        for point in leaf_points
+    ], dtype=float).reshape(-1, 4)
+    order = np.lexsort((flat[:, 0], leaf))
+    t_p, val_p, uu_p, ul_p = flat[order].T
+
+    # neighbouring support points of every parameter and time, found in one search by shifting the years of each
+    # parameter into a separate interval
+    t_min = min(np.nanmin(t_p, initial=np.inf), times.min(initial=np.inf))
+    t_max = max(np.nanmax(t_p, initial=-np.inf), times.max(initial=-np.inf))
+    span = t_max - t_min + 1.0 if np.isfinite(t_max) else 1.0
+    shift = np.arange(len(points))[:, np.newaxis] * span
+    idx = np.searchsorted(np.nan_to_num(t_p - t_min, nan=0.0) + shift[leaf, 0], (times - t_min) + shift, side='right')
+    lo = np.clip(idx - 1, start[:, np.newaxis], end[:, np.newaxis] - 1)
+    hi = np.clip(idx, start[:, np.newaxis], end[:, np.newaxis] - 1)
+    exact = (t_p[lo] == times) | (t_p[lo] >= times) | (hi == lo)
+    hi = np.where(exact, lo, hi)
+
+    t1, t2 = t_p[lo], t_p[hi]
+    val1, val2 = val_p[lo], val_p[hi]
+    uu1, uu2 = uu_p[lo], uu_p[hi]
+    ul1, ul2 = ul_p[lo], ul_p[hi]
+
+    # set lower uncertainty equal to upper uncertainty if not set for only one of the two points
+    fill = np.isnan(ul1) != np.isnan(ul2)
+    ul1 = np.where(fill & np.isnan(ul1), uu1, ul1)
+    ul2 = np.where(fill & np.isnan(ul2), uu2, ul2)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        def interp(x1, x2):
+            return np.where(exact, x1, x1 + (x2 - x1) / (t2 - t1) * (times - t1))
+
+        return interp(val1, val2), interp(uu1, uu2), interp(ul1, ul2)
+
+
+def _get_relative_uncertainty(uncertainty: Union[str, float]):
+    if isinstance(uncertainty, float):
+        return uncertainty
+    elif isinstance(uncertainty, str) and re.match(r'([0-9]*\.?[0-9]*)\s*%', uncertainty):
+        return float(uncertainty.rstrip('%'))/100.0
+    else:
+        raise Exception(f"Unknown relative uncertainty format: {uncertainty}")
 
 
 # Convert strings to floats with uncertainty, e.g. string '1.0 +- 0.1' becomes tuple (1.0, 0.1, 0.1).
+@lru_cache(maxsize=4096)
 def _convert_value(value: Union[str, float, int]):
     if isinstance(value, float) or isinstance(value, int):
         return value, None, None
@@ -124,55 +184,49 @@ def _convert_value(value: Union[str, float, int]):
 
 # Convert all units to standard units for straightforward calculation later on.
 def convert_unit(unit: str, units: dict, value: float = 1.0):
-    for unitType, unitOptions in units['types'].items():
-        if unit in unitOptions:
-            new_unit = unitOptions[0]
-            if unit == new_unit:
-                return value, unit
-            else:
-                return units['conversion'][f"{unit}__to__{new_unit}"] * value, new_unit
+    table = get_unit_table(units)
+    if unit not in table:
+        raise Exception(f"Unit not found: {unit}")
 
-    raise Exception(f"Unit not found: {unit}")
+    factor, new_unit = table[unit]
+    if factor is None:
+        raise Exception(f"Unit conversion not found: {unit}__to__{new_unit}")
 
+    return factor * value, new_unit
 
-# Select value provided for time t. Alternatively, if not existent, interpolate to time t from adjacent points.
-def _linear_interpolate(t: int, points: list):
-    if len(points) == 1:
-        t, val, unc, uncl = points[0]
-        return val, unc, uncl
 
-    p_min = None
-    p_max = None
+# Convert whole columns of values and units to standard units at once.
+def convert_units(values: pd.Series, unit_col: pd.Series, units: dict):
+    table = get_unit_table(units)
 
-    for t_p, val_p, unc_p, uncl_p in points:
-        if t_p == t:
-            return val_p, unc_p, uncl_p
-        elif t_p < t:
-            if p_min is None or t_p > p_min[0]:
-                p_min = (t_p, val_p, unc_p, uncl_p)
-        elif t_p > t:
-            if p_max is None or t_p < p_max[0]:
-                p_max = (t_p, val_p, unc_p, uncl_p)
-        else:
-            raise ValueError()
+    unknown = set(unit_col) - set(table)
+    if unknown:
+        raise Exception(f"Unit not found: {', '.join(sorted(map(str, unknown)))}")
 
-    if p_min is None:
-        return p_max[2:4]
-    if p_max is None:
-        return p_min[2:4]
-    if p_min is None and p_max is None:
-        raise Exception("Not enough interpolation points!")
+    factors = unit_col.map({unit: factor for unit, (factor, _) in table.items()})
+    if factors.isna().any():
+        missing = sorted(set(unit_col[factors.isna()]))
+        raise Exception(f"Unit conversion not found: {', '.join(f'{u}__to__{table[u][1]}' for u in missing)}")
 
-    (t1, val1, unc1, uncl1) = p_min
-    (t2, val2, unc2, uncl2) = p_max
+    return values * factors.astype(float), unit_col.map({unit: new_unit for unit, (_, new_unit) in table.items()})
 
-    # set lower uncertainty equal to upper uncertainty if not set for only one of the two points
-    if uncl1 != uncl2 and None in [uncl1, uncl2]:
-        uncl1 = unc1 if uncl1 is None else uncl1
-        uncl2 = unc2 if uncl2 is None else uncl2
 
-    val = val1 + (val2-val1)/(t2-t1) * (t-t1)
-    unc = unc1 + (unc2-unc1)/(t2-t1) * (t-t1) if not (unc1 is None or unc2 is None) else None
-    uncl = uncl1 + (uncl2-uncl1)/(t2-t1) * (t-t1) if not (uncl1 is None or uncl2 is None) else None
+# Table mapping every unit to its conversion factor and standard unit (the first unit of its type), or a factor of None
+# if no conversion is defined. Built once per contents of the units dict; units found in several types use the first
+# one.
+def get_unit_table(units: dict) -> dict[str, tuple]:
+    key = ResultCache.key(units)
+    table = _unit_tables.get(key)
+    if table is not None:
+        return table
+
+    table = {}
+    for unit_options in units['types'].values():
+        new_unit = unit_options[0]
+        for unit in unit_options:
+            if unit in table:
+                continue
+            table[unit] = (1.0 if unit == new_unit else units['conversion'].get(f"{unit}__to__{new_unit}"), new_unit)
 
-    return val, unc, uncl
+    _unit_tables.put(key, table)
+    return table
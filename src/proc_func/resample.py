@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+
+# Resample the fuel data of one fuel onto the union of its support years and the given sample years by linear
+# interpolation in time (constant outside the support). All numeric columns are interpolated at once using the same
+# neighbours and weights. Columns not provided for all support years are dropped.
+def resample_fuel_data(fuel_data: pd.DataFrame, fuel: str, t: np.ndarray) -> pd.DataFrame:
+    support = fuel_data[fuel_data['fuel'] == fuel].sort_values(by='year')
+    support = support.loc[:, support.notna().all()]
+
+    years = support['year'].to_numpy(dtype=float)
+    t_all = np.union1d(years, t)
+
+    # neighbouring support points and weights of all sample years
+    if len(years) > 1:
+        hi = np.clip(np.searchsorted(years, t_all, side='right'), 1, len(years) - 1)
+        lo = hi - 1
+        w = np.clip((t_all - years[lo]) / (years[hi] - years[lo]), 0.0, 1.0)[:, np.newaxis]
+    else:
+        lo = hi = np.zeros(len(t_all), dtype=int)
+        w = np.zeros((len(t_all), 1))
+
+    value_cols = [col for col in support.columns if col not in ['year', 'fuel', 'type']]
+    values = support[value_cols].to_numpy(dtype=float)
+
+    return pd.concat([
+        pd.DataFrame({'year': t_all, 'fuel': fuel, 'type': support['type'].iloc[0]}),
+        pd.DataFrame(values[lo] * (1.0 - w) + values[hi] * w, columns=value_cols),
+    ], axis=1)[support.columns]
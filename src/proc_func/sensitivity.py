@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+from src.proc_func.cost import eval_cost, params_cost
+from src.proc_func.ghgi import eval_ghgi, params_ghgi
+from src.proc_func.helper import ParameterHandler, ParameterStore
+
+
+# Sensitivity of the FSCPs of pairs of fuels (switching from fuel a to fuel b) with respect to the parameters of the
+# cost and GHGI formulas. Every swept parameter is varied over its range (absolute values or offsets relative to its
+# default value) while all other parameters are kept at their defaults. The formulas of each fuel are evaluated once on
+# stacked arrays of shape (year x swept parameter x sample). Returns a tidy table with one row per pair, year, swept
+# parameter, and sample, which also contains the default value of the parameter and the FSCP at the defaults.
+def calc_sensitivity(fuel_specs: dict, pairs: list[tuple[str, str]], years: list, sweeps: dict, n_samples: int,
+                     params_options: dict) -> pd.DataFrame:
+    x = {var: np.linspace(*settings['range'], n_samples) for var, settings in sweeps.items()}
+    shape = (len(years), len(sweeps), n_samples)
+
+    # evaluate cost and GHGI of every fuel once
+    evaluated = {}
+    for fuel in dict.fromkeys(f for pair in pairs for f in pair):
+        param_handler = ParameterHandler(ParameterStore(fuel_specs[fuel]['params']), params_options, year=list(years))
+        fuel_type, options = fuel_specs[fuel]['type'], fuel_specs[fuel]['options']
+        evaluated[fuel] = [
+            eval_sweep(params_func(param_handler, fuel_type, options), eval_func, fuel_type, sweeps, x, shape)
+            for params_func, eval_func in [(params_cost, eval_cost), (params_ghgi, eval_ghgi)]
+        ]
+
+    # compute FSCPs of all pairs
+    entries = []
+    for fuel_a, fuel_b in pairs:
+        (cost_a, cost_a_def, vals_ac), (ghgi_a, ghgi_a_def, vals_ag) = evaluated[fuel_a]
+        (cost_b, cost_b_def, vals_bc), (ghgi_b, ghgi_b_def, vals_bg) = evaluated[fuel_b]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fscp = np.maximum(cost_b - cost_a, 0.0) / (ghgi_a - ghgi_b)
+            fscp_default = np.maximum(cost_b_def - cost_a_def, 0.0) / (ghgi_a_def - ghgi_b_def)
+
+        # default values are taken from the last of the parameter sets containing the swept parameter
+        defaults = np.stack([
+            (vals_ac | vals_ag | vals_bc | vals_bg).get(var, np.full(len(years), np.nan))
+            for var in sweeps
+        ], axis=1)
+
+        entries.append(pd.DataFrame({
+            'fuel_a': fuel_a,
+            'fuel_b': fuel_b,
+            'year': np.repeat(years, len(sweeps) * n_samples),
+            'param': np.tile(np.repeat(list(sweeps), n_samples), len(years)),
+            'sample': np.tile(np.arange(n_samples), len(years) * len(sweeps)),
+            'x': np.tile(np.concatenate(list(x.values())), len(years)),
+            'default': np.repeat(defaults.ravel(), n_samples),
+            'fscp': fscp.ravel(),
+            'fscp_default': np.repeat(np.broadcast_to(fscp_default, len(years)), len(sweeps) * n_samples),
+        }))
+
+    return pd.concat(entries, ignore_index=True)
+
+
+# evaluate a formula with the swept parameters stacked along the parameter and sample axes, returning the totals, the
+# totals at the defaults, and the default values of the swept parameters contained in the formula (per year)
+def eval_sweep(p: dict, eval_func, fuel_type: str, sweeps: dict, x: dict, shape: tuple):
+    n_years = shape[0]
+    p_sweep = {}
+    p_default = {}
+    vals = {}
+
+    for name, value in p.items():
+        has_uncertainty = isinstance(value, tuple)
+        val = value[0] if has_uncertainty else value
+
+        # move year axis first, so that defaults broadcast against the stacked sweeps
+        val_stacked = np.reshape(val, (n_years, 1, 1)) if np.ndim(val) else val
+
+        if name in sweeps:
+            j = list(sweeps).index(name)
+            vals[name] = np.broadcast_to(val, n_years)
+
+            swept = np.array(np.broadcast_to(val_stacked, shape))
+            if sweeps[name]['mode'] == 'absolute':
+                swept[:, j, :] = x[name]
+            elif sweeps[name]['mode'] == 'relative':
+                swept[:, j, :] = np.reshape(vals[name], (n_years, 1)) + x[name]
+            else:
+                raise Exception(f"Unknown mode selected for variable {name}: {sweeps[name]['mode']}")
+            val_stacked = swept
+
+        p_sweep[name] = (val_stacked, 0.0, 0.0) if has_uncertainty else val_stacked
+        p_default[name] = (val, 0.0, 0.0) if has_uncertainty else val
+
+    total = sum(c['val'] for c in eval_func(p_sweep, fuel_type, calc_unc=False).values())
+    total_default = sum(c['val'] for c in eval_func(p_default, fuel_type, calc_unc=False).values())
+
+    return np.broadcast_to(total, shape), np.broadcast_to(total_default, n_years), vals
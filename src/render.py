@@ -0,0 +1,99 @@
+import json
+import multiprocessing
+import os
+import re
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+
+mm_per_inch = 25.4
+
+
+# serialised figures shared with forked render workers, so every figure is serialised once for all formats
+_fig_jsons: dict = {}
+
+
+# Render all (figure x format) pairs in a pool of persistent worker processes. Figures are serialised to JSON once in
+# the parent and parsed at most once per worker. Sizes are given in mm and converted to pixels using the dpi in the
+# same way as the export of piw v0.8.1 (see get_image_size for checking this against a piw export). Returns
+# the time spent on every figure (serialisation plus rendering of all formats, summed over workers) in seconds.
+def render_figs(figs: dict[str, go.Figure], sizes: dict[str, dict], output: Path, export_formats: list,
+                dpi: float, max_workers: Optional[int] = None) -> dict[str, float]:
+    global _fig_jsons
+
+    timing = {}
+    _fig_jsons = {}
+    _parsed.clear()
+    for fig_name, fig in figs.items():
+        if fig is None:
+            continue
+        t0 = time.perf_counter()
+        _fig_jsons[fig_name] = fig.to_json()
+        timing[fig_name] = time.perf_counter() - t0
+
+    output.mkdir(parents=True, exist_ok=True)
+    tasks = [
+        (fig_name, export_format, output / f"{fig_name}.{export_format}",
+         round(sizes[fig_name]['width'] / mm_per_inch * dpi), round(sizes[fig_name]['height'] / mm_per_inch * dpi))
+        for fig_name in _fig_jsons
+        for export_format in export_formats
+    ]
+
+    try:
+        if 'fork' in multiprocessing.get_all_start_methods() and len(tasks) > 1:
+            max_workers = min(len(tasks), max_workers or os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                results = list(pool.map(_render, tasks))
+        else:
+            results = [_render(task) for task in tasks]
+    finally:
+        _fig_jsons = {}
+
+    for fig_name, duration in results:
+        timing[fig_name] += duration
+
+    return timing
+
+
+# figures parsed in this worker process
+_parsed: dict = {}
+
+
+def _render(task: tuple) -> tuple[str, float]:
+    fig_name, export_format, path, width, height = task
+
+    t0 = time.perf_counter()
+    if fig_name not in _parsed:
+        _parsed[fig_name] = json.loads(_fig_jsons[fig_name])
+    pio.write_image(_parsed[fig_name], path, format=export_format, width=width, height=height, validate=False)
+
+    return fig_name, time.perf_counter() - t0
+
+
+# Get the size of an exported image: pixels for PNG, the width and height attributes for SVG, and points of the media
+# box for PDF.
+def get_image_size(path: Path) -> tuple[float, float]:
+    if path.suffix == '.png':
+        with open(path, 'rb') as f:
+            header = f.read(24)
+        if header[:8] != b'\x89PNG\r\n\x1a\n':
+            raise Exception(f"Not a PNG file: {path}")
+        width, height = struct.unpack('>II', header[16:24])
+        return float(width), float(height)
+    elif path.suffix == '.svg':
+        m = re.search(r'<svg[^>]*?\swidth="([\d.]+)[^"]*"[^>]*?\sheight="([\d.]+)[^"]*"', path.read_text())
+    elif path.suffix == '.pdf':
+        m = re.search(rb'/MediaBox\s*\[\s*[-\d.]+\s+[-\d.]+\s+([\d.]+)\s+([\d.]+)\s*\]', path.read_bytes())
+    else:
+        raise Exception(f"Unknown image format: {path.suffix}")
+
+    if m is None:
+        raise Exception(f"Could not determine size of image: {path}")
+
+    return float(m.group(1)), float(m.group(2))
@@ -6,6 +6,9 @@ import yaml
 
 BASE_PATH = pathlib.Path(__file__).parent.parent.resolve()
 
+# use the C-accelerated YAML loader if PyYAML was built with libyaml
+yaml_loader = getattr(yaml, 'CFullLoader', yaml.FullLoader)
+
 
 def load_csv_data_file(base_name: str):
     path = BASE_PATH / 'data' / f"{base_name}.csv"
@@ -15,19 +18,19 @@ def load_csv_data_file(base_name: str):
 def load_yaml_data_file(base_name: str):
     path = BASE_PATH / 'data' / f"{base_name}.yml"
     with open(path, 'r') as f:
-        ret = yaml.load(f.read(), Loader=yaml.FullLoader)
+        ret = yaml.load(f.read(), Loader=yaml_loader)
     return ret
 
 
 def load_yaml_config_file(base_name: str):
     path = BASE_PATH / 'config' / f"{base_name}.yml"
     with open(path, 'r') as f:
-        ret = yaml.load(f.read(), Loader=yaml.FullLoader)
+        ret = yaml.load(f.read(), Loader=yaml_loader)
     return ret
 
 
 def load_yaml_plot_config_file(base_name: str):
     path = BASE_PATH / 'config' / 'plots' / f"{base_name}.yml"
     with open(path, 'r') as f:
-        ret = yaml.load(f.read(), Loader=yaml.FullLoader)
+        ret = yaml.load(f.read(), Loader=yaml_loader)
     return ret['figures'], ret['config']
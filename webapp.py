@@ -14,6 +14,7 @@ from src.plots.BlueGreenPlot import BlueGreenPlot
 from src.plots.CostEmiOverTimePlot import CostEmiOverTimePlot
 from src.plots.FSCPOverTimePlot import FSCPOverTimePlot
 from src.plots.HeatmapPlot import HeatmapPlot
+from src.plots.PlotGroup import PlotGroup
 from src.plots.SensitivityPlot import SensitivityPlot
 from src.proc import process_inputs
 from src.update import update_inputs
@@ -115,6 +116,10 @@ metadata = {
 pio.templates['blue-green-H2'] = piw_template.update(layout=dict(font_family='Arial'))
 
 
+# all plots as one group (produced concurrently on export)
+plot_group = PlotGroup.of(CostEmiOverTimePlot, FSCPOverTimePlot, HeatmapPlot, SensitivityPlot, BarsPlot, BlueGreenPlot)
+
+
 # define webapp
 webapp = Webapp(
     piw_id='blue-green-H2',
@@ -134,7 +139,7 @@ webapp = Webapp(
     update=[update_inputs],
     ctrls_tables_modal=edit_tables_modal,
     proc=[process_inputs],
-    plots=[CostEmiOverTimePlot, FSCPOverTimePlot, HeatmapPlot, SensitivityPlot, BarsPlot, BlueGreenPlot],
+    plots=[plot_group],
     sort_figs=['fig1', 'fig3', 'fig4', 'fig5', 'figS1', 'figS2', 'figS5', 'figS7'],
     glob_cfg=load_yaml_config_file('global'),
     styles=load_yaml_config_file('styles'),